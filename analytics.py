@@ -0,0 +1,185 @@
+"""Materialized statistics for the admin dashboard.
+
+Write paths keep the cheap counters (totals, creations per day, papers per
+author) current with ``bump``. ``refresh`` recomputes everything from the
+base tables with pandas, including the orphan count that cannot be kept
+incrementally, and runs from ``flask stats refresh`` on a schedule (the
+``stats`` service in docker-compose). Per-day buckets count creations still
+in the bank: deleting a question or paper takes it out of its creation day
+again, so the cumulative growth totals end at the live totals. The
+dashboard only ever reads ``stat_summary`` and ``facet_count``, so it costs
+the same no matter how large the bank is.
+"""
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select, update
+
+import dbutil
+import facets
+from models import db, User, Question, Paper, StatSummary, paper_questions
+
+TOTAL = 'total'
+QUESTIONS_BY_DAY = 'questions_by_day'
+PAPERS_BY_DAY = 'papers_by_day'
+PAPERS_BY_AUTHOR = 'papers_by_author'
+ORPHANS = 'orphan_questions'
+META = 'meta'
+
+
+def bump(metric, bucket, delta=1):
+    if not delta:
+        return
+    dbutil.upsert_add(db.session, StatSummary.__table__,
+                      [{'metric': metric, 'bucket': str(bucket), 'value': delta}], 'value', ['metric', 'bucket'])
+
+
+def _day(value):
+    return value.strftime('%Y-%m-%d')
+
+
+def _today():
+    return _day(datetime.utcnow())
+
+
+def questions_created(count=1):
+    bump(TOTAL, 'questions', count)
+    bump(QUESTIONS_BY_DAY, _today(), count)
+
+
+def questions_deleted(created_at):
+    """Take questions out of the totals, given their ``created_at`` values."""
+    bump(TOTAL, 'questions', -len(created_at))
+    for day, count in Counter(_day(value) for value in created_at if value is not None).items():
+        bump(QUESTIONS_BY_DAY, day, -count)
+
+
+def questions_cleared():
+    """The whole question bank was deleted."""
+    db.session.execute(update(StatSummary).where(
+        (StatSummary.metric == TOTAL) & (StatSummary.bucket == 'questions') | (StatSummary.metric == ORPHANS)
+    ).values(value=0))
+    StatSummary.query.filter(StatSummary.metric == QUESTIONS_BY_DAY).delete(synchronize_session=False)
+
+
+def paper_created(author_id):
+    bump(TOTAL, 'papers')
+    bump(PAPERS_BY_DAY, _today())
+    if author_id is not None:
+        bump(PAPERS_BY_AUTHOR, author_id)
+
+
+def paper_deleted(author_id, created_at=None):
+    bump(TOTAL, 'papers', -1)
+    if created_at is not None:
+        bump(PAPERS_BY_DAY, _day(created_at), -1)
+    if author_id is not None:
+        bump(PAPERS_BY_AUTHOR, author_id, -1)
+
+
+def users_changed(delta):
+    bump(TOTAL, 'users', delta)
+
+
+def _read(statement):
+    result = db.session.execute(statement)
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def _by_day(dates):
+    if dates.empty:
+        return {}
+    return pd.to_datetime(dates).dt.strftime('%Y-%m-%d').value_counts().to_dict()
+
+
+def refresh():
+    """Recompute all summaries from the base tables in one transaction."""
+    questions = _read(select(Question.id, Question.created_at))
+    papers = _read(select(Paper.id, Paper.created_at, Paper.created_by_id))
+    members = _read(select(paper_questions.c.question_id))
+    users = db.session.query(User.id).count()
+
+    rows = [
+        (TOTAL, 'questions', len(questions)),
+        (TOTAL, 'papers', len(papers)),
+        (TOTAL, 'users', users),
+        (ORPHANS, 'all', int((~np.isin(questions['id'].to_numpy(), members['question_id'].to_numpy())).sum())),
+        (META, 'refreshed_at', int(time.time())),
+    ]
+    rows += [(QUESTIONS_BY_DAY, day, count) for day, count in _by_day(questions['created_at']).items()]
+    rows += [(PAPERS_BY_DAY, day, count) for day, count in _by_day(papers['created_at']).items()]
+    authors = papers['created_by_id'].dropna().astype('int64').value_counts()
+    rows += [(PAPERS_BY_AUTHOR, str(author), int(count)) for author, count in authors.items()]
+
+    StatSummary.query.delete()
+    db.session.execute(insert(StatSummary), [
+        {'metric': metric, 'bucket': str(bucket), 'value': int(value)} for metric, bucket, value in rows
+    ])
+
+
+def _metric(rows, metric):
+    return {row.bucket: row.value for row in rows if row.metric == metric}
+
+
+def growth(questions_by_day, papers_by_day, days):
+    """Daily creations over the last ``days`` days with cumulative totals and
+    a 7-day rolling mean, computed with pandas from the daily buckets."""
+    end = pd.Timestamp(datetime.utcnow().date())
+    index = pd.date_range(end - pd.Timedelta(days=days - 1), end, freq='D')
+    frame = pd.DataFrame({
+        'questions': pd.Series(questions_by_day, dtype='int64'),
+        'papers': pd.Series(papers_by_day, dtype='int64'),
+    })
+    frame.index = pd.to_datetime(frame.index)
+    frame = frame.sort_index().fillna(0).astype('int64')
+    # Creations before the window still count towards the cumulative totals
+    before = frame[frame.index < index[0]].sum()
+    window = frame.reindex(index, fill_value=0)
+    cumulative = window.cumsum() + before
+    rolling = window.rolling(7, min_periods=1).mean().round(2)
+    return [{
+        'date': day.strftime('%Y-%m-%d'),
+        'questions': int(window.at[day, 'questions']),
+        'papers': int(window.at[day, 'papers']),
+        'questions_total': int(cumulative.at[day, 'questions']),
+        'papers_total': int(cumulative.at[day, 'papers']),
+        'questions_7d_avg': float(rolling.at[day, 'questions']),
+    } for day in index]
+
+
+def dashboard(days=30, top_authors=10):
+    """Everything the dashboard shows, read from the summary tables only.
+
+    Never recomputes anything itself: until the first ``refresh`` the
+    summaries are whatever the write paths have counted (zeros on a fresh
+    upgrade) and ``refreshed`` is False.
+    """
+    rows = StatSummary.query.filter(StatSummary.metric != PAPERS_BY_AUTHOR).all()
+    totals = _metric(rows, TOTAL)
+
+    authors = StatSummary.query.filter(
+        StatSummary.metric == PAPERS_BY_AUTHOR, StatSummary.value > 0
+    ).order_by(StatSummary.value.desc()).limit(top_authors).all()
+    names = dict(db.session.query(User.id, User.username).filter(
+        User.id.in_([int(row.bucket) for row in authors])).all()) if authors else {}
+
+    refreshed_at = _metric(rows, META).get('refreshed_at')
+    return {
+        'totals': {
+            'questions': totals.get('questions', 0),
+            'papers': totals.get('papers', 0),
+            'users': totals.get('users', 0),
+        },
+        'questions_by_type': facets.counts()['type'],
+        'papers_by_author': [
+            {'user_id': int(row.bucket), 'username': names.get(int(row.bucket)), 'papers': row.value}
+            for row in authors
+        ],
+        'orphan_questions': _metric(rows, ORPHANS).get('all', 0),
+        'growth': growth(_metric(rows, QUESTIONS_BY_DAY), _metric(rows, PAPERS_BY_DAY), days),
+        'refreshed': refreshed_at is not None,
+        'refreshed_at': datetime.utcfromtimestamp(refreshed_at).isoformat() if refreshed_at else None,
+    }
@@ -1,21 +1,61 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file, Response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from urllib.parse import urlparse  # Using Python's built-in URL parsing
 from config import Config
-from models import db, User, Question, Paper
-from sqlalchemy import or_
+from models import db, User, Question, Paper, QuestionRevision, Tag, paper_questions, question_tags
+from sqlalchemy import or_, select
+from sqlalchemy.orm import selectinload
 from flask_migrate import Migrate
 import pandas as pd
+import click
 import io
 import csv
+import itertools
+import threading
+import time
 from datetime import datetime
 import os
 from werkzeug.security import generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from export_cache import ExportCache
+from importer import UploadStaging, ImportFileError, ChunkTooLargeError, ImportOwnerError, import_file, clear_progress, is_allowed_file, file_format
+from ratelimit import RateLimiter
+from printing import PaperRenderer
+from counters import CounterBuffer
+import revisions
+import choices
+import sync
+import facets
+import analytics
+import ordering
+import printing
+import counters
+import archive
 
 app = Flask(__name__)
 app.config.from_object(Config)
+if app.config['PROXY_FIX_X_FOR']:
+    # Behind a reverse proxy remote_addr is the proxy; take the client from X-Forwarded-For
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'],
+                            x_proto=app.config['PROXY_FIX_X_FOR'])
 db.init_app(app)
 migrate = Migrate(app, db)  # Initialize Flask-Migrate
+export_cache = ExportCache()
+export_cache.init_app(app)
+upload_staging = UploadStaging()
+upload_staging.init_app(app)
+limiter = RateLimiter()
+limiter.init_app(app)
+paper_renderer = PaperRenderer()
+paper_renderer.init_app(app)
+counter_buffer = CounterBuffer()
+counter_buffer.init_app(app)
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Bump when the contents of the import template change
+TEMPLATE_VERSION = 1
+# Bump when the print layout (printing.py / templates/print) changes
+PRINT_LAYOUT_VERSION = 1
 
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -31,6 +71,17 @@ def login():
     if current_user.is_authenticated:
         return redirect(url_for('index'))
     if request.method == 'POST':
+        # Throttle before touching the database or hashing the password
+        username_key = request.form['username'].strip().lower()
+        if not limiter.check(
+            (f'login:ip:{request.remote_addr}', *app.config['RATELIMIT_LOGIN_PER_IP']),
+            # Tight per IP and username; the looser per-account limit still stops a
+            # guessing run spread over many IPs without letting one IP lock a user out
+            (f'login:ip-user:{request.remote_addr}:{username_key}', *app.config['RATELIMIT_LOGIN_PER_USERNAME']),
+            (f'login:user:{username_key}', *app.config['RATELIMIT_LOGIN_PER_ACCOUNT'])
+        ):
+            flash('Too many login attempts, please try again later.')
+            return render_template('login.html'), 429
         user = User.query.filter_by(username=request.form['username']).first()
         if user is None or not user.check_password(request.form['password']):
             flash('Invalid username or password')
@@ -58,20 +109,87 @@ def index():
 @app.route('/paper/<int:id>')
 def view_paper(id):
     paper = Paper.query.get_or_404(id)
+    # Buffered in memory and flushed in batches, so hot papers cause no row-lock contention
+    counter_buffer.incr(counters.PAPER, paper.id, counters.VIEW)
+    counter_buffer.incr_many(counters.QUESTION, [q.id for q in paper.questions], counters.VIEW)
     return render_template('paper.html', paper=paper)
 
+@app.route('/api/questions/<int:id>/reveal', methods=['POST'])
+def reveal_answer(id):
+    if not limiter.check((f'reveal:ip:{request.remote_addr}', *app.config['RATELIMIT_REVEAL'])):
+        return jsonify({'error': 'Too many requests'}), 429
+    # Ids past the largest question are rejected here; a deleted id in range is dropped when the buffer is flushed
+    if not counter_buffer.in_range(counters.QUESTION, id):
+        return jsonify({'error': 'Question not found'}), 404
+    counter_buffer.incr(counters.QUESTION, id, counters.REVEAL)
+    return '', 204
+
+def filter_questions(query, types=(), tag_ids=()):
+    """Build the question listing query for a keyword and facet filters.
+
+    Returns ``(query, total)`` where ``total`` is taken from the facet count
+    table when the filter maps onto a single facet, or None if it has to be
+    counted.
+    """
+    questions = Question.query.options(selectinload(Question.tags))
+    if query:
+        questions = questions.filter(
+            or_(
+                Question.content.ilike(f'%{query}%'),
+                Question.correct_answer.ilike(f'%{query}%')
+            )
+        )
+    if types:
+        questions = questions.filter(Question.type.in_(types))
+    order = Question.id.desc()
+    if tag_ids:
+        # Walk the rarest tag's (tag_id, question_id) index newest first and probe
+        # the question_tags primary key for the other tags, so a page of a tag
+        # intersection stops after a few hundred index entries
+        tag_ids = sorted(set(tag_ids), key=lambda tag_id: facets.get_count(facets.TAG, tag_id))
+        driver = question_tags.alias('driver')
+        questions = questions.join(driver, driver.c.question_id == Question.id).filter(driver.c.tag_id == tag_ids[0])
+        for tag_id in tag_ids[1:]:
+            other = question_tags.alias()
+            questions = questions.filter(select(other.c.question_id).where(
+                other.c.question_id == driver.c.question_id, other.c.tag_id == tag_id).exists())
+        order = driver.c.question_id.desc()
+    
+    total = None
+    if not query and not tag_ids:
+        total = sum(facets.get_count(facets.TYPE, t) for t in types) if types else facets.total()
+    elif not query and not types and len(tag_ids) == 1:
+        total = facets.get_count(facets.TAG, tag_ids[0])
+    # Ids grow with insertion time, so newest-first by id matches created_at
+    # while letting the type and tag indexes (which end in the id) serve the order
+    return questions.order_by(order), total
+
+def paginate_questions(questions, total, page, per_page):
+    # Skip the COUNT(*) over the filtered bank when the facet table already knows it
+    pagination = questions.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    if total is None:
+        if len(pagination.items) < per_page and (pagination.items or page == 1):
+            # A short page is the last one, so it tells the total as well
+            total = (page - 1) * per_page + len(pagination.items)
+        else:
+            total = questions.order_by(None).count()
+    pagination.total = total
+    return pagination
+
+def facet_args():
+    types = [t for t in request.args.getlist('type') if t in choices.QUESTION_TYPES]
+    tag_ids = request.args.getlist('tag', type=int)
+    return types, tag_ids
+
 @app.route('/search')
 def search():
     query = request.args.get('q', '')
     page = request.args.get('page', 1, type=int)
     per_page = 20
-    questions = Question.query.filter(
-        or_(
-            Question.content.ilike(f'%{query}%'),
-            Question.correct_answer.ilike(f'%{query}%')
-        )
-    ).order_by(Question.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    return render_template('search.html', questions=questions, query=query)
+    types, tag_ids = facet_args()
+    questions = paginate_questions(*filter_questions(query, types, tag_ids), page, per_page)
+    return render_template('search.html', questions=questions, query=query,
+                           types=types, tag_ids=tag_ids, facets=facets.counts())
 
 # Admin routes
 @app.route('/admin')
@@ -80,13 +198,46 @@ def admin_dashboard():
     if not current_user.is_admin:
         flash('Access denied.')
         return redirect(url_for('index'))
-    questions_count = Question.query.count()
-    papers_count = Paper.query.count()
-    users_count = User.query.count()
+    stats = analytics.dashboard(days=14)
     return render_template('admin/dashboard.html',
-                         questions_count=questions_count,
-                         papers_count=papers_count,
-                         users_count=users_count)
+                         questions_count=stats['totals']['questions'],
+                         papers_count=stats['totals']['papers'],
+                         users_count=stats['totals']['users'],
+                         stats=stats)
+
+@app.route('/admin/api/counters')
+@login_required
+def admin_api_counters():
+    """Counts for ``ids`` of one entity, or the top ``limit`` by ``metric``."""
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    entity = request.args.get('entity', counters.QUESTION)
+    metric = request.args.get('metric', counters.VIEW)
+    if entity not in counters.ENTITIES or metric not in counters.METRICS:
+        return jsonify({'error': 'Unknown entity or metric'}), 400
+    # Include this worker's unflushed hits; other workers lag by at most one interval
+    counter_buffer.flush()
+    if request.args.get('ids'):
+        try:
+            ids = [int(i) for i in request.args['ids'].split(',')]
+        except ValueError:
+            return jsonify({'error': 'ids must be comma separated integers'}), 400
+        return jsonify({'entity': entity, 'counts': counters.counts(entity, ids)})
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    return jsonify({
+        'entity': entity,
+        'metric': metric,
+        'flush_interval': app.config['COUNTER_FLUSH_INTERVAL'],
+        'top': counters.top(entity, metric, limit)
+    })
+
+@app.route('/admin/api/stats')
+@login_required
+def admin_api_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    return jsonify(analytics.dashboard(days=days))
 
 @app.route('/admin/questions', methods=['GET', 'POST'])
 @login_required
@@ -98,27 +249,29 @@ def manage_questions():
         question = Question(
             type=request.form['type'],
             content=request.form['content'],
-            options=request.form.getlist('options[]') if 'options[]' in request.form else None,
-            correct_answer=request.form['correct_answer'],
             explanation=request.form['explanation'],
             created_by=current_user
         )
+        try:
+            question.set_answer(
+                request.form.getlist('options[]') if 'options[]' in request.form else None,
+                request.form['correct_answer']
+            )
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('manage_questions'))
         db.session.add(question)
+        question.tags = facets.resolve_tags(facets.split_tag_names(request.form.get('tags')))
+        facets.question_added(question.type, [tag.id for tag in question.tags])
+        analytics.questions_created()
         db.session.commit()
         flash('Question added successfully.')
         return redirect(url_for('manage_questions'))
     query = request.args.get('q', '')
     page = request.args.get('page', 1, type=int)
     per_page = 20
-    if query:
-        questions = Question.query.filter(
-            or_(
-                Question.content.ilike(f'%{query}%'),
-                Question.correct_answer.ilike(f'%{query}%')
-            )
-        ).order_by(Question.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    else:
-        questions = Question.query.order_by(Question.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    types, tag_ids = facet_args()
+    questions = paginate_questions(*filter_questions(query, types, tag_ids), page, per_page)
     return render_template('admin/questions.html', questions=questions, query=query)
 
 @app.route('/admin/papers', methods=['GET', 'POST'])
@@ -133,10 +286,10 @@ def manage_papers():
             description=request.form['description'],
             created_by=current_user
         )
-        question_ids = request.form.getlist('questions[]')
-        questions = Question.query.filter(Question.id.in_(question_ids)).all()
-        paper.questions = questions
         db.session.add(paper)
+        db.session.flush()
+        ordering.set_questions(paper.id, request.form.getlist('questions[]'))
+        analytics.paper_created(current_user.id)
         db.session.commit()
         flash('Paper added successfully.')
         return redirect(url_for('manage_papers'))
@@ -155,19 +308,12 @@ def admin_api_questions():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     query = request.args.get('q', '')
-    
-    if query:
-        questions = Question.query.filter(
-            or_(
-                Question.content.ilike(f'%{query}%'),
-                Question.correct_answer.ilike(f'%{query}%')
-            )
-        ).order_by(Question.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    else:
-        questions = Question.query.order_by(Question.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    types, tag_ids = facet_args()
+    questions = paginate_questions(*filter_questions(query, types, tag_ids), page, per_page)
     
     return jsonify({
         'items': [q.to_dict() for q in questions.items],
+        'facets': facets.counts(),
         'total': questions.total,
         'pages': questions.pages,
         'page': questions.page,
@@ -185,74 +331,200 @@ def api_question(id):
         return jsonify({'error': 'Access denied'}), 403
     question = Question.query.get_or_404(id)
     if request.method == 'DELETE':
+        sync.touch_papers_of([question.id])
+        facets.question_removed(question.type, [tag.id for tag in question.tags])
+        analytics.questions_deleted([question.created_at])
         db.session.delete(question)
+        sync.record_deletes('question', [question.id])
         db.session.commit()
         return jsonify({'message': 'Question deleted'})
     data = request.get_json()
+    before = revisions.snapshot(question)
+    before_tag_ids = [tag.id for tag in question.tags]
     question.content = data.get('content', question.content)
     question.type = data.get('type', question.type)
-    question.options = data.get('options', question.options)
-    question.correct_answer = data.get('correct_answer', question.correct_answer)
+    try:
+        question.set_answer(
+            data.get('options', question.export_options),
+            data.get('correct_answer', question.correct_answer)
+        )
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     question.explanation = data.get('explanation', question.explanation)
+    if 'tags' in data:
+        set_question_tags(question, data['tags'])
+    facets.question_changed(before['type'], before_tag_ids, question.type, [tag.id for tag in question.tags])
+    revisions.record_revision(question, before, current_user)
     db.session.commit()
     return jsonify(question.to_dict())
 
-# Export template route
-@app.route('/admin/questions/template')
+def set_question_tags(question, names):
+    tags = facets.resolve_tags(facets.split_tag_names(names))
+    if set(tags) != set(question.tags):
+        question.tags = tags
+        # Tags live in question_tags; bump the question so sync picks it up
+        question.updated_at = datetime.utcnow()
+
+@app.route('/admin/api/tags', methods=['GET', 'POST'])
 @login_required
-def export_template():
+def admin_api_tags():
     if not current_user.is_admin:
-        flash('Access denied.')
-        return redirect(url_for('index'))
-    
-    # Create a sample DataFrame with Chinese column names
-    df = pd.DataFrame({
-        '题目类型': ['单选题', '多选题', '问答题', '填空题'],
-        '题目内容': [
-            '示例：1+1=?', 
-            '示例：以下哪些是编程语言？', 
-            '示例：简述Python的特点',
-            '示例：___是世界上最大的搜索引擎'
-        ],
-        '选项': [
-            'A.1|B.2|C.3|D.4',
-            'A.Python|B.Word|C.Java|D.Excel',
-            '',
-            ''
-        ],
-        '正确答案': [
-            'B',
-            'A,C',
-            '1.简单易学\n2.开源免费\n3.跨平台',
-            '谷歌'
-        ],
-        '解析': [
-            '1+1=2',
-            'Python和Java是编程语言',
-            '这是解析',
-            '截至2024年谷歌仍是最大搜索引擎'
-        ]
-    })
-    
-    # Create Excel writer
+        return jsonify({'error': 'Access denied'}), 403
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        name = (data.get('name') or '').strip()
+        if not name:
+            return jsonify({'error': 'Missing fields'}), 400
+        if Tag.query.filter_by(name=name).first():
+            return jsonify({'error': 'Tag already exists'}), 400
+        tag = Tag(name=name, category=data.get('category') or None)
+        db.session.add(tag)
+        db.session.commit()
+        return jsonify(tag.to_dict()), 201
+    counts = {t['id']: t['count'] for t in facets.counts()['tag']}
+    tags = Tag.query.order_by(Tag.category, Tag.name).all()
+    return jsonify({'items': [dict(tag.to_dict(), count=counts.get(tag.id, 0)) for tag in tags]})
+
+@app.route('/admin/api/tags/<int:id>', methods=['PUT', 'DELETE'])
+@login_required
+def admin_api_tag(id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    tag = Tag.query.get_or_404(id)
+    if request.method == 'DELETE':
+        touch_tagged_questions(tag.id)
+        db.session.execute(question_tags.delete().where(question_tags.c.tag_id == tag.id))
+        facets.adjust(facets.TAG, tag.id, -facets.get_count(facets.TAG, tag.id))
+        db.session.delete(tag)
+        db.session.commit()
+        return jsonify({'message': 'Tag deleted'})
+    data = request.get_json() or {}
+    if 'name' in data:
+        name = (data['name'] or '').strip()
+        if not name:
+            return jsonify({'error': 'Missing fields'}), 400
+        if Tag.query.filter(Tag.name == name, Tag.id != id).first():
+            return jsonify({'error': 'Tag already exists'}), 400
+        tag.name = name
+    if 'category' in data:
+        tag.category = data['category'] or None
+    if db.session.is_modified(tag):
+        touch_tagged_questions(tag.id)
+    db.session.commit()
+    return jsonify(tag.to_dict())
+
+def touch_tagged_questions(tag_id):
+    # Sync payloads carry tag names, so questions must look changed when their tag does
+    Question.query.filter(Question.id.in_(
+        select(question_tags.c.question_id).where(question_tags.c.tag_id == tag_id)
+    )).update({Question.updated_at: datetime.utcnow()}, synchronize_session=False)
+
+@app.route('/admin/api/questions/<int:id>/revisions')
+@login_required
+def admin_api_question_revisions(id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    items = QuestionRevision.query.filter_by(question_id=id).order_by(QuestionRevision.version.desc()).all()
+    if not items and Question.query.get(id) is None:
+        return jsonify({'error': 'Question not found'}), 404
+    return jsonify({'items': [r.to_dict() for r in items]})
+
+@app.route('/admin/api/questions/<int:id>/revisions/<int:version>')
+@login_required
+def admin_api_question_revision(id, version):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    state = revisions.reconstruct(id, version)
+    if state is None:
+        question = Question.query.get(id)
+        # Questions that were never edited have no log; their only version is live
+        if question is None or question.version != version:
+            return jsonify({'error': 'Revision not found'}), 404
+        state = revisions.snapshot(question)
+    return jsonify(dict(state, id=id, version=version))
+
+@app.route('/admin/api/questions/changed')
+@login_required
+def admin_api_questions_changed():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    try:
+        since = datetime.fromisoformat(request.args['since'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'since must be an ISO 8601 timestamp'}), 400
+    now = datetime.utcnow()
+    return jsonify({'ids': revisions.changed_since(since), 'as_of': now.isoformat()})
+
+def build_workbook(df, sheet_name):
+    """Render a DataFrame to xlsx bytes with column widths fitted to content."""
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='题目模板')
-        worksheet = writer.sheets['题目模板']
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+        worksheet = writer.sheets[sheet_name]
         
         # Adjust column widths
         for idx, col in enumerate(df.columns):
             max_length = max(df[col].astype(str).apply(len).max(), len(col)) + 2
             worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
-    
-    output.seek(0)
+    return output.getvalue()
+
+def send_cached_export(key, build, download_name, suffix='.xlsx', mimetype=XLSX_MIMETYPE, as_attachment=True):
+    """Serve an export from the artifact cache, building it on a miss."""
+    # Pass an open file: a concurrent eviction may unlink the path at any time
+    fileobj = export_cache.open_or_create(key, build, suffix=suffix)
     return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='question_template.xlsx'
+        fileobj,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        conditional=True,
+        etag=key,
+        max_age=0
     )
 
+# Export template route
+@app.route('/admin/questions/template')
+@login_required
+def export_template():
+    if not current_user.is_admin:
+        flash('Access denied.')
+        return redirect(url_for('index'))
+    
+    def build():
+        # Create a sample DataFrame with Chinese column names
+        df = pd.DataFrame({
+            '题目类型': ['单选题', '多选题', '问答题', '填空题'],
+            '题目内容': [
+                '示例：1+1=?', 
+                '示例：以下哪些是编程语言？', 
+                '示例：简述Python的特点',
+                '示例：___是世界上最大的搜索引擎'
+            ],
+            '选项': [
+                'A.1|B.2|C.3|D.4',
+                'A.Python|B.Word|C.Java|D.Excel',
+                '',
+                ''
+            ],
+            '正确答案': [
+                'B',
+                'A,C',
+                '1.简单易学\n2.开源免费\n3.跨平台',
+                '谷歌'
+            ],
+            '解析': [
+                '1+1=2',
+                'Python和Java是编程语言',
+                '这是解析',
+                '截至2024年谷歌仍是最大搜索引擎'
+            ]
+        })
+        return build_workbook(df, '题目模板')
+    
+    key = ExportCache.make_key('template', TEMPLATE_VERSION)
+    return send_cached_export(key, build, 'question_template.xlsx')
+
 # Export questions route
 @app.route('/admin/questions/export')
 @login_required
@@ -264,57 +536,123 @@ def export_questions():
     question_ids = request.args.get('ids')
     paper_id = request.args.get('paper_id')
     
+    # Only fetch (id, version, updated_at) to build the cache key; the full
+    # rows are loaded when the artifact actually has to be generated.
+    versions = db.session.query(Question.id, Question.version, Question.updated_at)
     if paper_id:
         paper = Paper.query.get_or_404(paper_id)
-        questions = paper.questions
+        versions = versions.join(paper_questions, paper_questions.c.question_id == Question.id).filter(
+            paper_questions.c.paper_id == paper.id).order_by(paper_questions.c.position)
+        key_parts = ['paper', paper.id, paper.updated_at]
         filename_prefix = f'paper_{paper.id}_questions'
     elif question_ids:
         ids = [int(id) for id in question_ids.split(',')]
-        questions = Question.query.filter(Question.id.in_(ids)).all()
+        versions = versions.filter(Question.id.in_(ids))
+        key_parts = ['selected']
         filename_prefix = 'selected_questions'
     else:
-        questions = Question.query.all()
+        key_parts = ['all']
         filename_prefix = 'all_questions'
+    versions = versions.order_by(Question.id).all()  # papers: position first, then id
+    key = ExportCache.make_key(*key_parts, [tuple(v) for v in versions])
     
-    # Create DataFrame with Chinese column names
-    data = []
-    for question in questions:
-        data.append({
-            '题目ID': question.id,
-            '题目类型': {
-                'single_choice': '单选题',
-                'multiple_choice': '多选题',
-                'essay': '问答题',
-                'fill_blank': '填空题'
-            }.get(question.type, question.type),
-            '题目内容': question.content,
-            '选项': '|'.join(question.options) if question.options else '',
-            '正确答案': question.correct_answer,
-            '解析': question.explanation or ''
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Create Excel writer
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='题目列表')
-        worksheet = writer.sheets['题目列表']
+    def build():
+        loaded = {q.id: q for q in Question.query.filter(
+            Question.id.in_([v.id for v in versions])
+        )} if versions else {}
+        questions = [loaded[v.id] for v in versions]
         
-        # Adjust column widths
-        for idx, col in enumerate(df.columns):
-            max_length = max(df[col].astype(str).apply(len).max(), len(col)) + 2
-            worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+        # Create DataFrame with Chinese column names
+        data = []
+        for question in questions:
+            data.append({
+                '题目ID': question.id,
+                '题目类型': {
+                    'single_choice': '单选题',
+                    'multiple_choice': '多选题',
+                    'essay': '问答题',
+                    'fill_blank': '填空题'
+                }.get(question.type, question.type),
+                '题目内容': question.content,
+                '选项': '|'.join(question.export_options) if question.options else '',
+                '正确答案': question.correct_answer,
+                '解析': question.explanation or ''
+            })
+        
+        df = pd.DataFrame(data)
+        return build_workbook(df, '题目列表')
     
-    output.seek(0)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f'{filename_prefix}_{timestamp}.xlsx'
+    return send_cached_export(key, build, filename)
+
+def flash_import_result(result):
+    message_parts = []
+    if result.success_count > 0:
+        message_parts.append(f'Successfully imported {result.success_count} questions')
+    if result.error_count > 0:
+        message_parts.append(f'Failed to import {result.error_count} questions')
+        for msg in result.error_messages[:5]:  # Show first 5 errors
+            flash(msg, 'danger')
+        if result.error_count > 5:
+            flash(f'... and {result.error_count - 5} more errors', 'danger')
     
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=filename
+    flash(' | '.join(message_parts), 'success' if result.success_count > 0 else 'danger')
+
+def run_staged_import(upload_id, user_id, meta):
+    """Parse a staged upload claimed as ``meta`` and insert its questions, recording progress.
+
+    Progress is committed together with every batch, so an interrupted
+    import run again continues right after its last committed row.
+    """
+    def progress(result):
+        meta.update(result.to_dict())
+        upload_staging.heartbeat(upload_id, meta)
+    
+    try:
+        result = import_file(
+            upload_staging.data_path(upload_id),
+            user_id,
+            fmt=file_format(meta['filename']),
+            batch_size=app.config['IMPORT_BATCH_SIZE'],
+            progress=progress,
+            upload_id=upload_id,
+            owner=meta['owner']
+        )
+    except ImportOwnerError:
+        # Presumed dead and taken over by a resumed import, which now owns the upload
+        raise
+    except Exception as e:
+        meta.update({'state': 'failed', 'error': str(e)})
+        upload_staging.save_meta(upload_id, meta)
+        clear_progress(upload_id)
+        os.remove(upload_staging.data_path(upload_id))
+        raise
+    clear_progress(upload_id)
+    os.remove(upload_staging.data_path(upload_id))
+    meta.update(result.to_dict())
+    meta['state'] = 'done'
+    upload_staging.save_meta(upload_id, meta)
+    return result
+
+def run_import_job(upload_id, user_id, meta):
+    """Background thread body for /complete; the outcome is recorded in the upload's meta."""
+    with app.app_context():
+        try:
+            run_staged_import(upload_id, user_id, meta)
+        except ImportFileError:
+            pass
+        except ImportOwnerError:
+            app.logger.warning('Import %s was taken over by another worker', upload_id)
+        except Exception:
+            app.logger.exception('Import %s failed', upload_id)
+        finally:
+            db.session.remove()
+
+def import_allowed():
+    return limiter.check(
+        (f'import:ip:{request.remote_addr}', *app.config['RATELIMIT_IMPORT']),
+        (f'import:user:{current_user.id}', *app.config['RATELIMIT_IMPORT'])
     )
 
 # Import questions route
@@ -325,6 +663,10 @@ def import_questions():
         flash('Access denied.')
         return redirect(url_for('index'))
     
+    if not import_allowed():
+        flash('Too many imports, please try again later.', 'danger')
+        return redirect(url_for('manage_questions'))
+    
     if 'file' not in request.files:
         flash('No file uploaded', 'danger')
         return redirect(url_for('manage_questions'))
@@ -334,99 +676,95 @@ def import_questions():
         flash('No file selected', 'danger')
         return redirect(url_for('manage_questions'))
     
-    if not file.filename.endswith('.xlsx'):
-        flash('Please upload an Excel file (.xlsx)', 'danger')
+    if not is_allowed_file(file.filename):
+        flash('Please upload an Excel (.xlsx) or CSV (.csv) file', 'danger')
         return redirect(url_for('manage_questions'))
     
+    upload_id = upload_staging.stage_file(file)
     try:
-        # Read Excel file
-        df = pd.read_excel(file)
-        
-        # Validate required columns
-        required_columns = ['题目类型', '题目内容', '正确答案']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            flash(f'Missing required columns: {", ".join(missing_columns)}', 'danger')
-            return redirect(url_for('manage_questions'))
-        
-        # Clean and validate data
-        success_count = 0
-        error_count = 0
-        error_messages = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Skip row if required fields are empty
-                if pd.isna(row['题目类型']) or pd.isna(row['题目内容']) or pd.isna(row['正确答案']):
-                    error_count += 1
-                    error_messages.append(f'Row {index + 2}: Missing required fields')
-                    continue
-                
-                # Convert question type
-                type_mapping = {
-                    '单选题': 'single_choice',
-                    '多选题': 'multiple_choice',
-                    '问答题': 'essay',
-                    '填空题': 'fill_blank'
-                }
-                
-                question_type = type_mapping.get(str(row['题目类型']).strip())
-                if not question_type:
-                    error_count += 1
-                    error_messages.append(f'Row {index + 2}: Invalid question type "{row["题目类型"]}"')
-                    continue
-                
-                # Process options
-                options = None
-                if '选项' in df.columns and not pd.isna(row['选项']):
-                    options = [opt.strip() for opt in str(row['选项']).split('|') if opt.strip()]
-                    if question_type in ['single_choice', 'multiple_choice'] and not options:
-                        error_count += 1
-                        error_messages.append(f'Row {index + 2}: Choice questions must have options')
-                        continue
-                
-                # Create question
-                question = Question(
-                    type=question_type,
-                    content=str(row['题目内容']).strip(),
-                    options=options,
-                    correct_answer=str(row['正确答案']).strip(),
-                    explanation=str(row['解析']).strip() if '解析' in df.columns and not pd.isna(row['解析']) else None,
-                    created_by=current_user
-                )
-                
-                db.session.add(question)
-                success_count += 1
-                
-            except Exception as e:
-                error_count += 1
-                error_messages.append(f'Row {index + 2}: {str(e)}')
-                continue
-        
-        # Commit all successful questions
-        try:
-            db.session.commit()
-            message_parts = []
-            if success_count > 0:
-                message_parts.append(f'Successfully imported {success_count} questions')
-            if error_count > 0:
-                message_parts.append(f'Failed to import {error_count} questions')
-                for msg in error_messages[:5]:  # Show first 5 errors
-                    flash(msg, 'danger')
-                if len(error_messages) > 5:
-                    flash(f'... and {len(error_messages) - 5} more errors', 'danger')
-            
-            flash(' | '.join(message_parts), 'success' if success_count > 0 else 'danger')
-            
-        except Exception as e:
-            db.session.rollback()
-            flash(f'Database error: {str(e)}', 'danger')
-            
+        result = run_staged_import(upload_id, current_user.id, upload_staging.claim(upload_id))
+        flash_import_result(result)
+    except ImportFileError as e:
+        flash(str(e), 'danger')
     except Exception as e:
         flash(f'Error reading file: {str(e)}', 'danger')
+    finally:
+        upload_staging.discard(upload_id)
     
     return redirect(url_for('manage_questions'))
 
+# Chunked, resumable import API
+@app.route('/admin/api/imports', methods=['POST'])
+@login_required
+def api_create_import():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    if not import_allowed():
+        return jsonify({'error': 'Too many imports, please try again later'}), 429
+    data = request.get_json() or {}
+    filename = data.get('filename', '')
+    if not is_allowed_file(filename):
+        return jsonify({'error': 'Please upload an Excel (.xlsx) or CSV (.csv) file'}), 400
+    upload_id = upload_staging.create(filename, data.get('size'))
+    clear_progress(older_than=upload_staging.ttl)
+    meta = upload_staging.load_meta(upload_id)
+    meta['chunk_size'] = app.config['IMPORT_CHUNK_SIZE']
+    return jsonify(meta), 201
+
+@app.route('/admin/api/imports/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+@login_required
+def api_import_upload(upload_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    try:
+        meta = upload_staging.load_meta(upload_id)
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    if request.method == 'GET':
+        return jsonify(meta)
+    if request.method == 'DELETE':
+        upload_staging.discard(upload_id)
+        return jsonify({'message': 'Upload discarded'})
+    
+    if meta['state'] != 'uploading':
+        return jsonify({'error': 'Upload already completed'}), 409
+    if request.content_length and request.content_length > app.config['IMPORT_CHUNK_SIZE']:
+        return jsonify({'error': 'Chunk too large'}), 413
+    offset = request.args.get('offset', 0, type=int)
+    try:
+        # Content-Length is absent for chunked request bodies, so the cap is also enforced while writing
+        offset = upload_staging.append(upload_id, offset, request.stream, max_bytes=app.config['IMPORT_CHUNK_SIZE'])
+    except ChunkTooLargeError:
+        return jsonify({'error': 'Chunk too large'}), 413
+    except ValueError as e:
+        # Client is out of sync; tell it where to resume from
+        return jsonify({'error': 'Offset mismatch', 'offset': e.args[0]}), 409
+    return jsonify({'upload_id': upload_id, 'offset': offset})
+
+@app.route('/admin/api/imports/<upload_id>/complete', methods=['POST'])
+@login_required
+def api_complete_import(upload_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    try:
+        meta = upload_staging.load_meta(upload_id)
+    except KeyError:
+        return jsonify({'error': 'Upload not found'}), 404
+    if meta.get('size') is not None and meta['offset'] != meta['size']:
+        return jsonify({'error': 'Upload incomplete', 'offset': meta['offset']}), 409
+    try:
+        # An interrupted import (worker killed or restarted) is resumed where it stopped;
+        # one whose worker still sends heartbeats is refused
+        meta = upload_staging.claim(upload_id)
+    except ValueError as e:
+        if e.args[0] == 'importing':
+            return jsonify({'error': 'Import already running'}), 409
+        return jsonify({'error': 'Upload already completed'}), 409
+    # Parsing a large file outlasts the worker timeout; poll GET /admin/api/imports/<id> for the outcome
+    threading.Thread(target=run_import_job, args=(upload_id, current_user.id, meta),
+                     name=f'import-{upload_id}', daemon=True).start()
+    return jsonify(meta), 202, {'Location': url_for('api_import_upload', upload_id=upload_id)}
+
 # 编辑题目
 @app.route('/admin/questions/<int:question_id>', methods=['GET', 'POST'])
 @login_required
@@ -440,11 +778,19 @@ def edit_question(question_id):
     if request.method == 'POST':
         try:
             data = request.get_json()
+            before = revisions.snapshot(question)
+            before_tag_ids = [tag.id for tag in question.tags]
             question.type = data['type']
             question.content = data['content']
-            question.options = data['options'].split('|') if data['options'] else None
-            question.correct_answer = data['correct_answer']
+            question.set_answer(
+                data['options'].split('|') if data['options'] else None,
+                data['correct_answer']
+            )
             question.explanation = data['explanation']
+            if 'tags' in data:
+                set_question_tags(question, data['tags'])
+            facets.question_changed(before['type'], before_tag_ids, question.type, [tag.id for tag in question.tags])
+            revisions.record_revision(question, before, current_user)
             
             db.session.commit()
             return jsonify({'message': '题目更新成功'})
@@ -455,9 +801,10 @@ def edit_question(question_id):
         'id': question.id,
         'type': question.type,
         'content': question.content,
-        'options': '|'.join(question.options) if question.options else '',
+        'options': '|'.join(question.export_options) if question.options else '',
         'correct_answer': question.correct_answer,
-        'explanation': question.explanation or ''
+        'explanation': question.explanation or '',
+        'tags': ','.join(tag.name for tag in question.tags)
     })
 
 # 删除题目
@@ -470,7 +817,11 @@ def delete_question(question_id):
     
     question = Question.query.get_or_404(question_id)
     try:
+        sync.touch_papers_of([question.id])
+        facets.question_removed(question.type, [tag.id for tag in question.tags])
+        analytics.questions_deleted([question.created_at])
         db.session.delete(question)
+        sync.record_deletes('question', [question.id])
         db.session.commit()
         return jsonify({'message': '题目删除成功'})
     except Exception as e:
@@ -494,8 +845,10 @@ def edit_paper(paper_id):
             
             # 更新试卷题目
             if 'questions' in data:
-                question_ids = data['questions']
-                paper.questions = Question.query.filter(Question.id.in_(question_ids)).all()
+                # Only removed, added and moved questions are written
+                ordering.set_questions(paper.id, data['questions'])
+                # Membership lives in paper_questions; bump the paper so sync sees it
+                paper.updated_at = datetime.utcnow()
             
             db.session.commit()
             return jsonify({'message': '试卷更新成功'})
@@ -519,12 +872,126 @@ def delete_paper(paper_id):
     
     paper = Paper.query.get_or_404(paper_id)
     try:
+        ordering.clear(paper.id)
         db.session.delete(paper)
+        analytics.paper_deleted(paper.created_by_id, paper.created_at)
+        sync.record_deletes('paper', [paper.id])
         db.session.commit()
         return jsonify({'message': '试卷删除成功'})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+# 打印版试卷（DOCX / 可打印 HTML）
+@app.route('/admin/papers/<int:paper_id>/print')
+@login_required
+def print_paper(paper_id):
+    if not current_user.is_admin:
+        flash('Access denied.')
+        return redirect(url_for('index'))
+    
+    paper = Paper.query.get_or_404(paper_id)
+    fmt = request.args.get('format', 'html')
+    if fmt not in printing.FORMATS:
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    answers = request.args.get('answers') == '1'
+    
+    versions = [(q.id, q.version, q.updated_at) for q in paper.questions]
+    key = ExportCache.make_key('print', PRINT_LAYOUT_VERSION, paper.id, paper.updated_at, versions, fmt, answers)
+    download_name = f'paper_{paper.id}_{"answers" if answers else "questions"}.{fmt}'
+    
+    def build():
+        return printing.render_job({
+            'name': download_name, 'spec': printing.paper_spec(paper), 'format': fmt, 'answers': answers
+        })[1]
+    
+    # HTML opens in the browser so it can be printed or saved as PDF
+    return send_cached_export(key, build, download_name, suffix='.' + fmt,
+                              mimetype=printing.MIMETYPES[fmt], as_attachment=fmt != 'html')
+
+@app.route('/admin/papers/<int:paper_id>/print/bundle')
+@login_required
+def print_paper_bundle(paper_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    paper = Paper.query.get_or_404(paper_id)
+    formats = [f for f in request.args.get('formats', 'docx,html').split(',') if f]
+    if not formats or any(f not in printing.FORMATS for f in formats):
+        return jsonify({'error': 'formats must be a comma separated subset of docx,html'}), 400
+    answer_modes = {'both': (False, True), '0': (False,), '1': (True,)}.get(request.args.get('answers', 'both'))
+    if answer_modes is None:
+        return jsonify({'error': 'answers must be 0, 1 or both'}), 400
+    
+    # Either named candidates (e.g. student numbers) or a number of variants;
+    # without either the bundle holds the paper in its original order
+    candidates = list(dict.fromkeys(
+        c.strip() for c in request.args.get('candidates', '').split(',') if c.strip()))
+    if not candidates:
+        variants = request.args.get('variants', 0, type=int)
+        candidates = [f'{i:03d}' for i in range(1, variants + 1)] or [None]
+    seed = request.args.get('seed', '')
+    shuffle_questions = request.args.get('shuffle_questions', '1') != '0'
+    shuffle_options = request.args.get('shuffle_options', '1') != '0'
+    
+    if len(candidates) * len(formats) * len(answer_modes) > app.config['PRINT_MAX_FILES']:
+        return jsonify({'error': f'A bundle may contain at most {app.config["PRINT_MAX_FILES"]} files'}), 400
+    
+    spec = printing.paper_spec(paper)
+    jobs = []
+    for candidate, folder in printing.folder_names(candidates).items():
+        for answers in answer_modes:
+            for fmt in formats:
+                jobs.append({
+                    'name': f'{folder}/paper_{paper.id}_{"answers" if answers else "questions"}.{fmt}',
+                    'spec': spec, 'format': fmt, 'answers': answers, 'candidate': candidate,
+                    'seed': seed, 'shuffle_questions': shuffle_questions, 'shuffle_options': shuffle_options
+                })
+    files = paper_renderer.render(jobs)
+    if candidates != [None]:
+        files = itertools.chain(
+            [('manifest.json', printing.manifest(spec, candidates, seed, shuffle_questions, shuffle_options))],
+            files)
+    
+    # Rendering only uses the prepared spec, so the stream needs no app context
+    return Response(printing.zip_stream(files), mimetype='application/zip', headers={
+        'Content-Disposition': f'attachment; filename=paper_{paper.id}_print.zip'
+    })
+
+# 调整试卷题目顺序
+@app.route('/admin/papers/<int:paper_id>/questions', methods=['POST'])
+@login_required
+def move_paper_question(paper_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    paper = Paper.query.get_or_404(paper_id)
+    data = request.get_json(silent=True) or {}
+    question_id = data.get('question_id')
+    after_id = data.get('after_id')
+    if not isinstance(question_id, int) or not (after_id is None or isinstance(after_id, int)):
+        return jsonify({'error': 'question_id and after_id must be integers'}), 400
+    question = Question.query.get_or_404(question_id)
+    try:
+        position = ordering.move(paper.id, question.id, after_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    paper.updated_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify({'question_id': question.id, 'after_id': after_id, 'position': position})
+
+@app.route('/admin/papers/<int:paper_id>/questions/<int:question_id>', methods=['DELETE'])
+@login_required
+def remove_paper_question(paper_id, question_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    paper = Paper.query.get_or_404(paper_id)
+    if not ordering.remove(paper.id, question_id):
+        return jsonify({'error': 'Question is not in this paper'}), 404
+    paper.updated_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify({'message': '题目已移出试卷'})
+
 # 获取题目列表的API
 @app.route('/admin/api/questions')
 @login_required
@@ -554,8 +1021,18 @@ def bulk_delete_questions():
         if not question_ids:
             return jsonify({'error': '未选择任何题目'}), 400
             
+        # Detach from papers and tags first; bulk deletes skip the ORM relationship cleanup
+        sync.touch_papers_of(question_ids)
+        facets.questions_removed(question_ids)
+        db.session.execute(paper_questions.delete().where(paper_questions.c.question_id.in_(question_ids)))
+        db.session.execute(question_tags.delete().where(question_tags.c.question_id.in_(question_ids)))
+        
+        analytics.questions_deleted(db.session.scalars(
+            select(Question.created_at).where(Question.id.in_(question_ids))).all())
+        
         # Delete questions from database
         Question.query.filter(Question.id.in_(question_ids)).delete(synchronize_session=False)
+        sync.record_deletes('question', question_ids)
         db.session.commit()
         
         return jsonify({
@@ -572,6 +1049,13 @@ def clear_all_questions():
     try:
         # Delete all questions from database
         count = Question.query.count()
+        sync.record_delete_all('question', Question)
+        Paper.query.filter(Paper.questions.any()).update(
+            {Paper.updated_at: datetime.utcnow()}, synchronize_session=False)
+        db.session.execute(paper_questions.delete())
+        db.session.execute(question_tags.delete())
+        facets.reset()
+        analytics.questions_cleared()
         Question.query.delete()
         db.session.commit()
         
@@ -583,6 +1067,30 @@ def clear_all_questions():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# 增量同步API
+@app.route('/admin/api/sync')
+@login_required
+def admin_api_sync():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Access denied'}), 403
+    token = request.args.get('token')
+    try:
+        since = sync.decode_token(token) if token else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    compress = request.args.get('compress') == 'gzip' or \
+        'gzip' in request.headers.get('Accept-Encoding', '')
+    records = sync.iter_changes(since, app.config['SYNC_CLOCK_SKEW'])
+    response = Response(
+        stream_with_context(sync.ndjson_stream(records, compress)),
+        mimetype='application/x-ndjson'
+    )
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 # 用户管理API
 @app.route('/admin/api/users')
 @login_required
@@ -637,6 +1145,7 @@ def api_create_user():
     )
     user.set_password(data['password'])
     db.session.add(user)
+    analytics.users_changed(1)
     db.session.commit()
     return jsonify({'message': 'User created'})
 
@@ -650,6 +1159,7 @@ def api_update_delete_user(id):
         if user.id == current_user.id:
             return jsonify({'error': 'Cannot delete yourself'}), 400
         db.session.delete(user)
+        analytics.users_changed(-1)
         db.session.commit()
         return jsonify({'message': 'User deleted'})
     data = request.get_json()
@@ -669,6 +1179,11 @@ def api_update_delete_user(id):
 @app.route('/api/user/change_password', methods=['POST'])
 @login_required
 def api_change_password():
+    if not limiter.check(
+        (f'password:ip:{request.remote_addr}', *app.config['RATELIMIT_PASSWORD_CHANGE']),
+        (f'password:user:{current_user.id}', *app.config['RATELIMIT_PASSWORD_CHANGE'])
+    ):
+        return jsonify({'error': 'Too many attempts, please try again later'}), 429
     data = request.get_json()
     old_password = data.get('old_password')
     new_password = data.get('new_password')
@@ -689,6 +1204,75 @@ def admin_users():
         return redirect(url_for('index'))
     return render_template('admin/users.html')
 
+@app.cli.command('rebuild-facets')
+def rebuild_facets_command():
+    """Recompute the facet count table from the question bank."""
+    facets.rebuild()
+    db.session.commit()
+
+@app.cli.group('stats')
+def stats_cli():
+    """Dashboard statistics."""
+
+@stats_cli.command('refresh')
+@click.option('--every', type=int, metavar='SECONDS',
+              help='Keep running and refresh every SECONDS (the scheduler container in docker-compose).')
+def stats_refresh_command(every):
+    """Recompute the materialized dashboard statistics (run periodically)."""
+    while True:
+        try:
+            analytics.refresh()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if not every:
+                raise
+            # A scheduled run must survive e.g. the database restarting; retry next interval
+            app.logger.exception('Refreshing dashboard statistics failed')
+        if not every:
+            return
+        db.session.remove()
+        time.sleep(every)
+
+@app.cli.group('bank')
+def bank_cli():
+    """Archive and restore the whole question bank."""
+
+def echo_table(table, rows):
+    click.echo(f'{table:<20} {rows:>10} rows', err=True)
+
+@bank_cli.command('dump')
+@click.argument('output', type=click.File('wb'))
+@click.option('--chunk-size', default=archive.CHUNK_SIZE, show_default=True, help='Rows per compressed chunk.')
+def bank_dump_command(output, chunk_size):
+    """Write all tables to OUTPUT ('-' for stdout)."""
+    counts = archive.dump(output, chunk_size=chunk_size, progress=echo_table)
+    click.echo(f'Archived {sum(counts.values())} rows from {len(counts)} tables', err=True)
+
+@bank_cli.command('load')
+@click.argument('archive_file', metavar='INPUT', type=click.File('rb'))
+@click.option('--replace', is_flag=True, help='Delete all existing rows first.')
+def bank_load_command(archive_file, replace):
+    """Restore an archive written by 'flask bank dump' ('-' for stdin)."""
+    try:
+        counts = archive.load(archive_file, replace=replace, progress=echo_table)
+    except archive.ArchiveError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Restored {sum(counts.values())} rows into {len(counts)} tables', err=True)
+
+@bank_cli.command('verify')
+@click.argument('archive_file', metavar='INPUT', type=click.File('rb'))
+def bank_verify_command(archive_file):
+    """Check the checksums of an archive without touching the database."""
+    try:
+        header, counts = archive.verify(archive_file)
+    except archive.ArchiveError as e:
+        raise click.ClickException(str(e))
+    for table, rows in counts.items():
+        echo_table(table, rows)
+    click.echo(f'OK: {sum(counts.values())} rows, revision {header["revision"]}, '
+               f'dumped from {header["dialect"]} at {header["created_at"]}', err=True)
+
 def ensure_admin_user():
     with app.app_context():
         admin = User.query.filter_by(username='admin').first()
@@ -696,6 +1280,7 @@ def ensure_admin_user():
             user = User(username='admin', email='admin@example.com', is_admin=True)
             user.set_password('admin123')
             db.session.add(user)
+            analytics.users_changed(1)
             db.session.commit()
 
 if __name__ == '__main__':
@@ -0,0 +1,339 @@
+"""Database-agnostic archive and restore of the whole question bank.
+
+``flask bank dump`` streams every table (users, questions, papers, their
+memberships, tags, revisions, ...) into a single file; ``flask bank load``
+restores it into an empty database of any supported backend, e.g. to move
+a bank from SQLite to MySQL or to clone production into staging.
+
+The file is a sequence of frames after an 8 byte magic::
+
+    kind (1 byte) | payload length (4 bytes) | crc32 of payload (4 bytes) | payload
+
+Every payload is zlib-compressed JSON. A dump consists of one ``H`` header
+frame, then per table a ``T`` frame with its column names, ``R`` frames of
+up to ``chunk_size`` rows (each row a JSON array in column order) and an
+``E`` frame with the row count and a sha256 of the uncompressed row
+chunks, and finally a ``Z`` frame with the sha256 of all bytes before it.
+Corruption is therefore caught at the first damaged frame, truncation at
+the end of the file. Tables are written parents first and rows in primary
+key order, so ids, timestamps and paper question order survive unchanged.
+JSON columns are copied as their stored text.
+
+Restore first verifies the whole archive (spooling stdin to a temporary
+file), then replaces the data in one transaction, inserting each chunk with
+one executemany. Secondary indexes are dropped before the load and built
+once at the end, and MySQL foreign key/unique checks are switched off for
+the session.
+"""
+import hashlib
+import json
+import shutil
+import struct
+import tempfile
+import zlib
+from datetime import date, datetime
+
+from sqlalchemy import JSON, Date, DateTime, Integer, Text, bindparam, func, inspect, select, text, type_coerce
+
+from models import db
+
+MAGIC = b'QBANK\x00\x01\n'
+FORMAT_VERSION = 1
+FRAME = struct.Struct('>cII')
+CHUNK_SIZE = 5000
+COMPRESS_LEVEL = 6
+
+HEADER = b'H'
+TABLE = b'T'
+ROWS = b'R'
+TABLE_END = b'E'
+TRAILER = b'Z'
+
+
+class ArchiveError(ValueError):
+    """The archive is damaged or does not fit the target database."""
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot archive value of type {type(value).__name__}')
+
+
+def _dumps(obj):
+    return json.dumps(obj, default=_encode, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class _Writer:
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self._write(MAGIC)
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+
+    def frame(self, kind, data):
+        payload = zlib.compress(data, COMPRESS_LEVEL)
+        self._write(FRAME.pack(kind, len(payload), zlib.crc32(payload)))
+        self._write(payload)
+
+    def finish(self, trailer):
+        trailer['sha256'] = self.digest.hexdigest()
+        self.frame(TRAILER, _dumps(trailer))
+
+
+def iter_frames(fileobj):
+    """Yield ``(kind, uncompressed payload)``, verifying every checksum on the way."""
+    digest = hashlib.sha256()
+    magic = fileobj.read(len(MAGIC))
+    if magic != MAGIC:
+        raise ArchiveError('Not a question bank archive')
+    digest.update(magic)
+    while True:
+        header = fileobj.read(FRAME.size)
+        if not header:
+            raise ArchiveError('Archive is truncated (no trailer)')
+        if len(header) < FRAME.size:
+            raise ArchiveError('Archive is truncated')
+        kind, length, crc = FRAME.unpack(header)
+        payload = fileobj.read(length)
+        if len(payload) < length:
+            raise ArchiveError('Archive is truncated')
+        if zlib.crc32(payload) != crc:
+            raise ArchiveError(f'Checksum mismatch in {kind.decode(errors="replace")!r} frame')
+        data = zlib.decompress(payload)
+        if kind == TRAILER:
+            if json.loads(data)['sha256'] != digest.hexdigest():
+                raise ArchiveError('Archive checksum mismatch')
+            if fileobj.read(1):
+                raise ArchiveError('Unexpected data after the archive trailer')
+            yield kind, data
+            return
+        digest.update(header)
+        digest.update(payload)
+        yield kind, data
+
+
+def _revision(connection):
+    if not inspect(connection).has_table('alembic_version'):
+        return None
+    return connection.execute(text('SELECT version_num FROM alembic_version')).scalar()
+
+
+def _archived_columns(table):
+    # JSON columns are read as their stored text, so SQL NULL and JSON null stay distinct
+    return [type_coerce(column, Text).label(column.name) if isinstance(column.type, JSON) else column
+            for column in table.columns]
+
+
+def dump(fileobj, chunk_size=CHUNK_SIZE, progress=None):
+    """Write the whole bank to ``fileobj``; returns ``{table: rows}``."""
+    writer = _Writer(fileobj)
+    tables = db.metadata.sorted_tables
+    counts = {}
+    with db.engine.connect() as connection:
+        writer.frame(HEADER, _dumps({
+            'format': FORMAT_VERSION,
+            'created_at': datetime.utcnow(),
+            'dialect': connection.dialect.name,
+            'revision': _revision(connection),
+            'tables': [table.name for table in tables]
+        }))
+        for table in tables:
+            writer.frame(TABLE, _dumps({'table': table.name, 'columns': [column.name for column in table.columns]}))
+            digest = hashlib.sha256()
+            count = 0
+            result = connection.execution_options(yield_per=chunk_size).execute(
+                select(*_archived_columns(table)).order_by(*table.primary_key.columns))
+            for rows in result.partitions():
+                data = _dumps([list(row) for row in rows])
+                digest.update(data)
+                count += len(rows)
+                writer.frame(ROWS, data)
+            writer.frame(TABLE_END, _dumps({'table': table.name, 'rows': count, 'sha256': digest.hexdigest()}))
+            counts[table.name] = count
+            if progress:
+                progress(table.name, count)
+    writer.finish({'tables': counts, 'bytes': writer.size})
+    return counts
+
+
+def verify(fileobj):
+    """Check an archive without touching the database; returns its header and ``{table: rows}``."""
+    header, counts, _ = _scan(fileobj)
+    return header, counts
+
+
+def _scan(fileobj):
+    header, counts, columns, current = None, {}, {}, None
+    for kind, data in iter_frames(fileobj):
+        if kind == HEADER:
+            header = json.loads(data)
+        elif kind == TABLE:
+            meta = json.loads(data)
+            current = meta['table']
+            columns[current] = meta['columns']
+            digest, count = hashlib.sha256(), 0
+        elif kind == ROWS:
+            digest.update(data)
+            count += len(json.loads(data))
+        elif kind == TABLE_END:
+            _check_table(json.loads(data), current, count, digest)
+            counts[current] = count
+    if header is None:
+        raise ArchiveError('Archive has no header')
+    return header, counts, columns
+
+
+def _check_table(end, table_name, count, digest):
+    if end['table'] != table_name or end['rows'] != count or end['sha256'] != digest.hexdigest():
+        raise ArchiveError(f'Table {table_name} does not match its checksum')
+
+
+def _converters(table, columns):
+    converters = []
+    for name in columns:
+        column_type = table.c[name].type
+        if isinstance(column_type, DateTime):
+            converters.append(datetime.fromisoformat)
+        elif isinstance(column_type, Date):
+            converters.append(date.fromisoformat)
+        else:
+            converters.append(None)
+    return converters
+
+
+def _insert_statement(table, columns):
+    # Bind archived JSON text as text so it is stored verbatim instead of being encoded again
+    return table.insert().values({name: bindparam(name, type_=Text())
+                                  for name in columns if isinstance(table.c[name].type, JSON)})
+
+
+def _deferred_indexes(tables):
+    """Secondary indexes to build after the load.
+
+    Indexes that lead with a foreign key column stay: MySQL uses them to
+    enforce the constraint and refuses to drop them.
+    """
+    indexes = []
+    for table in tables:
+        foreign = {fk.parent.name for fk in table.foreign_keys}
+        indexes.extend(index for index in table.indexes if index.expressions[0].name not in foreign)
+    return indexes
+
+
+def _bulk_mode(connection, enabled):
+    if connection.dialect.name == 'mysql':
+        value = 0 if enabled else 1
+        connection.execute(text(f'SET FOREIGN_KEY_CHECKS={value}, UNIQUE_CHECKS={value}'))
+
+
+def _reset_sequences(connection, tables):
+    # MySQL and SQLite continue after the largest inserted id; PostgreSQL sequences do not
+    if connection.dialect.name != 'postgresql':
+        return
+    for table in tables:
+        columns = list(table.primary_key.columns)
+        if len(columns) == 1 and isinstance(columns[0].type, Integer) and columns[0].autoincrement in (True, 'auto'):
+            connection.execute(select(func.setval(
+                func.pg_get_serial_sequence(connection.dialect.identifier_preparer.format_table(table), columns[0].name),
+                func.coalesce(func.max(columns[0]), 0) + 1, False)))
+
+
+def _non_empty(connection, tables):
+    return [table.name for table in tables
+            if connection.execute(select(1).select_from(table).limit(1)).first() is not None]
+
+
+def _seekable(fileobj):
+    """``fileobj`` itself, or a temporary copy of it if it cannot be read twice (stdin)."""
+    if fileobj.seekable():
+        return fileobj
+    spool = tempfile.TemporaryFile()
+    shutil.copyfileobj(fileobj, spool)
+    spool.seek(0)
+    return spool
+
+
+def load(fileobj, replace=False, progress=None):
+    """Restore an archive written by dump(); returns ``{table: rows}``.
+
+    The whole archive is verified before the database is touched. The
+    target must be migrated to the archive's revision and be empty unless
+    ``replace`` is set; the deletes and all inserts then run in a single
+    transaction, so a load that fails leaves the existing bank as it was.
+    Only the deferred indexes are dropped outside it (DDL commits on MySQL)
+    and they are rebuilt whatever the outcome.
+    """
+    fileobj = _seekable(fileobj)
+    header, _, archived_columns = _scan(fileobj)
+    fileobj.seek(0)
+    if header.get('format') != FORMAT_VERSION:
+        raise ArchiveError(f'Unsupported archive format {header.get("format")}')
+
+    tables = {table.name: table for table in db.metadata.sorted_tables}
+    unknown = [name for name in header['tables'] if name not in tables]
+    if unknown:
+        raise ArchiveError(f'Unknown tables in archive: {", ".join(unknown)}')
+    for name, columns in archived_columns.items():
+        missing = [column for column in columns if column not in tables[name].c]
+        if missing:
+            raise ArchiveError(f'Columns {", ".join(missing)} of {name} are not in the database')
+    targets = [tables[name] for name in header['tables']]
+
+    counts = {}
+    with db.engine.connect() as connection:
+        revision = _revision(connection)
+        if header['revision'] and revision and header['revision'] != revision:
+            raise ArchiveError(f'Archive is at revision {header["revision"]}, database at {revision}; '
+                               'migrate the database to the same revision first')
+        existing = _non_empty(connection, tables.values())
+        if existing and not replace:
+            raise ArchiveError(f'Database is not empty ({", ".join(existing)}); use --replace to overwrite it')
+        connection.rollback()
+
+        _bulk_mode(connection, True)
+        indexes = _deferred_indexes(targets)
+        for index in indexes:
+            index.drop(connection, checkfirst=True)
+        connection.commit()
+        try:
+            for table in reversed(db.metadata.sorted_tables):
+                if table.name in existing:
+                    connection.execute(table.delete())
+            for kind, data in iter_frames(fileobj):
+                if kind == TABLE:
+                    meta = json.loads(data)
+                    table, columns = tables[meta['table']], meta['columns']
+                    statement = _insert_statement(table, columns)
+                    converters = _converters(table, columns)
+                    digest, count = hashlib.sha256(), 0
+                elif kind == ROWS:
+                    digest.update(data)
+                    rows = json.loads(data)
+                    connection.execute(statement, [
+                        {name: value if convert is None or value is None else convert(value)
+                         for name, convert, value in zip(columns, converters, row)}
+                        for row in rows])
+                    count += len(rows)
+                elif kind == TABLE_END:
+                    # Already verified; this guards against the file changing underneath
+                    _check_table(json.loads(data), table.name, count, digest)
+                    counts[table.name] = count
+                    if progress:
+                        progress(table.name, count)
+            _reset_sequences(connection, targets)
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            for index in indexes:
+                index.create(connection, checkfirst=True)
+            _bulk_mode(connection, False)
+            connection.commit()
+    return counts
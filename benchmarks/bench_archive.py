@@ -0,0 +1,93 @@
+"""Time a full bank dump and restore.
+
+Usage: python benchmarks/bench_archive.py [questions]
+
+Fills a throwaway SQLite database with ``questions`` questions (default
+1,000,000) spread over papers of 50 questions with two tags each, dumps it
+with archive.dump and restores the archive into a second database, then
+reports rows per second and the archive size. The target defaults to
+another SQLite file; set BENCH_TARGET_URI (e.g. a MySQL database migrated
+to head) to measure a SQLite -> MySQL move.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+workdir = tempfile.mkdtemp()
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'source.db')
+os.environ['EXPORT_CACHE_DIR'] = os.path.join(workdir, 'export_cache')
+os.environ['IMPORT_STAGING_DIR'] = os.path.join(workdir, 'import_staging')
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert
+
+import archive
+from app import app
+from models import db, Question, Paper, Tag, paper_questions, question_tags
+
+BATCH = 20000
+
+
+def fill(count):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        connection.execute(insert(Tag), [{'id': i + 1, 'name': f'标签{i}', 'category': '知识点', 'created_at': now}
+                                         for i in range(200)])
+        for start in range(0, count, BATCH):
+            ids = range(start + 1, min(start + BATCH, count) + 1)
+            connection.execute(insert(Question), [{
+                'id': i, 'type': 'single_choice', 'content': f'第 {i} 题' + '题干' * rng.randint(5, 60),
+                'options': ['甲', '乙', '丙', '丁'], 'correct_answer': 'A', 'answer_mask': 1,
+                'explanation': '解析' * rng.randint(0, 20), 'created_at': now, 'updated_at': now, 'version': 1
+            } for i in ids])
+            connection.execute(insert(question_tags), [{'question_id': i, 'tag_id': tag}
+                                                       for i in ids for tag in rng.sample(range(1, 201), 2)])
+        papers = count // 50
+        connection.execute(insert(Paper), [{'id': i + 1, 'title': f'试卷 {i + 1}', 'created_at': now, 'updated_at': now}
+                                           for i in range(papers)])
+        for start in range(0, count, BATCH):
+            connection.execute(insert(paper_questions), [{
+                'paper_id': (i - 1) // 50 + 1, 'question_id': i, 'position': ((i - 1) % 50 + 1) * 1024
+            } for i in range(start + 1, min(start + BATCH, papers * 50) + 1)])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    path = os.path.join(workdir, 'bank.qbank')
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        fill(count)
+        print(f'filled {count} questions in {time.perf_counter() - start:.1f} s')
+
+        start = time.perf_counter()
+        with open(path, 'wb') as f:
+            counts = archive.dump(f)
+        elapsed = time.perf_counter() - start
+        rows = sum(counts.values())
+        print(f'dump    {rows} rows in {elapsed:6.1f} s  {rows / elapsed:9.0f} rows/s  '
+              f'{os.path.getsize(path) / 2 ** 20:.1f} MiB archive')
+
+        target = os.environ.get('BENCH_TARGET_URI') or 'sqlite:///' + os.path.join(workdir, 'target.db')
+        engine = create_engine(target)
+        if target.startswith('sqlite'):
+            db.metadata.create_all(engine)
+        db.engines[None], source = engine, db.engine
+        try:
+            start = time.perf_counter()
+            with open(path, 'rb') as f:
+                archive.load(f, replace=True)
+            elapsed = time.perf_counter() - start
+            print(f'load    {rows} rows in {elapsed:6.1f} s  {rows / elapsed:9.0f} rows/s  into {engine.url.get_backend_name()}')
+        finally:
+            db.engines[None] = source
+
+
+if __name__ == '__main__':
+    main()
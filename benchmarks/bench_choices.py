@@ -0,0 +1,72 @@
+"""Compare grading/rendering cost of free-text options with packed bitmasks.
+
+Usage: python benchmarks/bench_choices.py [questions]
+
+"Before" mirrors what the app used to do on every pass: split the stored
+"A.xxx" strings and the "A,C" answer text, then compare label sets. "After"
+uses the packed representation from choices.py: options are labelled by
+position and grading is one integer comparison against answer_mask.
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import choices
+
+
+def make_bank(count):
+    rng = random.Random(0)
+    bank = []
+    for _ in range(count):
+        n = rng.randint(2, 6)
+        correct = sorted(rng.sample(range(n), rng.randint(1, n)))
+        options = [f'{choices.LABELS[i]}.选项内容 {i}' for i in range(n)]
+        answer = ','.join(choices.LABELS[i] for i in correct)
+        selected = [choices.LABELS[i] for i in correct] if rng.random() < 0.5 else ['A']
+        bank.append((options, answer, selected))
+    return bank
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bank = make_bank(count)
+    packed = []
+    for options, answer, selected in bank:
+        texts, _, mask = choices.normalize('multiple_choice', options, answer)
+        packed.append((texts, mask, choices.labels_to_mask(selected)))
+
+    label_re = re.compile(r'^([A-Z])\.(.*)$')
+
+    def grade_before():
+        correct = 0
+        for options, answer, selected in bank:
+            labels = {label_re.match(o).group(1) for o in options}
+            key = {a.strip() for a in answer.replace('，', ',').split(',') if a.strip() in labels}
+            correct += key == set(selected)
+        return correct
+
+    def grade_after():
+        correct = 0
+        for _, mask, selected_mask in packed:
+            correct += mask == selected_mask
+        return correct
+
+    def render_before():
+        return [[label_re.match(o).groups() for o in options] for options, _, _ in bank]
+
+    def render_after():
+        return [list(zip(choices.LABELS, texts)) for texts, _, _ in packed]
+
+    assert grade_before() == grade_after()
+    for label, func in [('grade (text parse)', grade_before), ('grade (bitmask)', grade_after),
+                        ('render (regex split)', render_before), ('render (packed)', render_after)]:
+        elapsed = min(timeit.repeat(func, number=1, repeat=5))
+        print(f'{label:<22} {count} questions  {elapsed * 1000:8.1f} ms  {elapsed / count * 1e9:7.0f} ns/question')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Compare concurrent-connection capacity of the sync Flask routes and the
+async exam API under the same number of worker processes.
+
+Usage: python benchmarks/bench_exam_api.py [workers] [seconds] [latency_ms]
+
+Starts the Flask app under gunicorn (sync workers) and exam_api under
+hypercorn with ``workers`` processes each (default 2) on one database, then
+fetches the questions of a 50-question paper at increasing numbers of
+concurrent connections for ``seconds`` per level (default 5) and reports
+throughput and latency percentiles. The sync side is the admin paper JSON
+route, the async side /exam/api/papers/<id>/questions.
+
+By default a throwaway SQLite database is used, where queries barely wait
+on I/O, so every query is delayed by ``latency_ms`` (default 10) in both
+servers to stand in for a database across the network: a blocking sleep
+in the sync app and an awaited one in the async app. Pass 0 to measure
+raw SQLite, or point DATABASE_URI at a MySQL server (no delay is added
+then) to measure the real thing.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+LEVELS = (1, 8, 32, 128, 512)
+TIMEOUT = 30
+
+
+def make_sync_app(latency):
+    from sqlalchemy import event
+    from app import app
+    from models import db
+    if latency:
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: time.sleep(latency))
+    return app
+
+
+def make_async_app(latency):
+    import aiosqlite
+    from exam_api import app
+    if latency:
+        execute = aiosqlite.Cursor.execute
+
+        async def delayed_execute(self, *args, **kwargs):
+            await asyncio.sleep(latency)
+            return await execute(self, *args, **kwargs)
+        aiosqlite.Cursor.execute = delayed_execute
+    return app
+
+
+def setup_database(workdir):
+    os.environ.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(workdir, 'bench.db'))
+    os.environ['EXPORT_CACHE_DIR'] = os.path.join(workdir, 'export_cache')
+    os.environ['IMPORT_STAGING_DIR'] = os.path.join(workdir, 'import_staging')
+    os.environ['RATELIMIT_STORAGE'] = 'memory'
+    from app import app, ensure_admin_user
+    from models import db, Question, Paper
+    import ordering
+
+    with app.app_context():
+        db.create_all()
+    ensure_admin_user()
+    with app.app_context():
+        questions = [Question(type='single_choice', content=f'第 {i} 题' + '题干' * 40, correct_answer='A')
+                     for i in range(50)]
+        for question in questions:
+            question.set_answer(['A.甲', 'B.乙', 'C.丙', 'D.丁'], 'A')
+        paper = Paper(title='benchmark')
+        db.session.add_all(questions + [paper])
+        db.session.flush()
+        ordering.set_questions(paper.id, [question.id for question in questions])
+        db.session.commit()
+        return paper.id
+
+
+def login(port):
+    """Log in through the Flask app and return the session cookie."""
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    opener = urllib.request.build_opener(NoRedirect)
+    data = urllib.parse.urlencode({'username': 'admin', 'password': 'admin123'}).encode()
+    try:
+        opener.open(f'http://127.0.0.1:{port}/login', data)
+    except urllib.error.HTTPError as e:
+        return e.headers['Set-Cookie'].split(';', 1)[0]
+    raise RuntimeError('login did not redirect')
+
+
+def wait_for(port):
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1)
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+async def fetch(port, path, cookie):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write((f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nCookie: {cookie}\r\n'
+                  'Connection: close\r\n\r\n').encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def load(port, path, cookie, concurrency, seconds):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(fetch(port, path, cookie), TIMEOUT)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+    return len(latencies) / elapsed, percentile(0.5), percentile(0.99), errors
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    workdir = tempfile.mkdtemp()
+    paper_id = setup_database(workdir)
+    if not os.environ['DATABASE_URI'].startswith('sqlite'):
+        latency = 0
+
+    env = dict(os.environ, PYTHONPATH=ROOT, BENCH_DB_LATENCY_MS=str(latency))
+    servers = {
+        'sync (gunicorn)': (5101, 'sync', ['gunicorn', '--workers', str(workers), '--bind', '127.0.0.1:5101',
+                                   '--backlog', '2048', '--log-level', 'warning', 'benchmarks.bench_exam_api:sync_app'],
+                            f'/admin/papers/{paper_id}'),
+        'async (hypercorn)': (5102, 'async', ['hypercorn', '--workers', str(workers), '--bind', '127.0.0.1:5102',
+                                     '--backlog', '2048', 'benchmarks.bench_exam_api:async_app'],
+                              f'/exam/api/papers/{paper_id}/questions'),
+    }
+    processes = [subprocess.Popen(command, cwd=ROOT, env=dict(env, BENCH_SERVE=kind), stdout=subprocess.DEVNULL)
+                 for _, kind, command, _ in servers.values()]
+    try:
+        for port, _, _, _ in servers.values():
+            wait_for(port)
+        cookie = login(5101)
+        print(f'{workers} workers each, {seconds:g}s per level, {latency:g} ms added per query, '
+              f'database {os.environ["DATABASE_URI"]}')
+        print(f'{"server":<18} {"conns":>6} {"req/s":>9} {"p50 ms":>9} {"p99 ms":>9} {"errors":>7}')
+        for name, (port, _, _, path) in servers.items():
+            for concurrency in LEVELS:
+                rate, p50, p99, errors = asyncio.run(load(port, path, cookie, concurrency, seconds))
+                print(f'{name:<18} {concurrency:>6} {rate:>9.1f} {p50:>9.1f} {p99:>9.1f} {errors:>7}')
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+# The server processes started by main() import this module for their app
+if os.environ.get('BENCH_SERVE') == 'sync':
+    sync_app = make_sync_app(float(os.environ['BENCH_DB_LATENCY_MS']) / 1000)
+elif os.environ.get('BENCH_SERVE') == 'async':
+    async_app = make_async_app(float(os.environ['BENCH_DB_LATENCY_MS']) / 1000)
+
+if __name__ == '__main__':
+    main()
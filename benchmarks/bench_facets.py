@@ -0,0 +1,77 @@
+"""Time filtered question listings on a large bank.
+
+Usage: python benchmarks/bench_facets.py [questions]
+
+Fills a throwaway SQLite database with ``questions`` rows (default 500k)
+spread over the four types and 50 tags, builds the facet counts, then times
+the first page of the admin question listing for several facet filters
+through ``filter_questions``/``paginate_questions``, as the routes do.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    workdir = os.environ.get('BENCH_DIR') or tempfile.mkdtemp()
+    os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['EXPORT_CACHE_DIR'] = os.path.join(workdir, 'export_cache')
+    os.environ['IMPORT_STAGING_DIR'] = os.path.join(workdir, 'import_staging')
+    from app import app, filter_questions, paginate_questions
+    from models import db, Question, Tag, question_tags
+    from sqlalchemy import insert
+    import facets
+
+    rng = random.Random(0)
+    types = ['single_choice', 'multiple_choice', 'essay', 'fill_blank']
+    start = datetime(2024, 1, 1)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Tag), [{'id': i, 'name': f'tag{i}'} for i in range(1, 51)])
+        for offset in range(0, count, 50000):
+            rows = [{
+                'id': i + 1,
+                'type': types[i % 4],
+                'content': f'question {i}',
+                'correct_answer': 'A',
+                'created_at': start + timedelta(seconds=i),
+                'updated_at': start + timedelta(seconds=i)
+            } for i in range(offset, min(offset + 50000, count))]
+            db.session.execute(insert(Question), rows)
+            db.session.execute(insert(question_tags), [
+                {'question_id': row['id'], 'tag_id': tag_id}
+                for row in rows for tag_id in rng.sample(range(1, 51), 2)
+            ])
+        facets.rebuild()
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+
+        cases = [
+            ('no filter', (), ()),
+            ('type=essay', ('essay',), ()),
+            ('tag=7', (), (7,)),
+            ('type=essay&tag=7', ('essay',), (7,)),
+            ('tag=7&tag=8', (), (7, 8)),
+            ('type=essay&tag=7&tag=8', ('essay',), (7, 8)),
+            ('tag=7&tag=8&tag=9', (), (7, 8, 9)),
+        ]
+        print(f'{count} questions')
+        for label, type_filter, tag_filter in cases:
+            timings = []
+            for _ in range(5):
+                db.session.expire_all()
+                t0 = time.perf_counter()
+                page = paginate_questions(*filter_questions('', type_filter, tag_filter), 1, 20)
+                [q.to_dict() for q in page.items]
+                timings.append(time.perf_counter() - t0)
+            print(f'{label:<24} total={page.total:<8} best={min(timings) * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
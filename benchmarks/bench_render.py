@@ -0,0 +1,85 @@
+"""Measure print rendering throughput in papers per second.
+
+Usage: python benchmarks/bench_render.py [candidates] [questions]
+
+Builds a synthetic paper (default 60 questions across all four types) and
+renders a per-candidate bundle for ``candidates`` candidates (default 200):
+DOCX and HTML, with and without answers, i.e. four files per candidate.
+The bundle is rendered inline and then through PaperRenderer with 2, 4, ...
+workers up to the CPU count, always streamed through zip_stream as the
+bundle route does.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import choices
+import printing
+
+
+def make_spec(count):
+    rng = random.Random(0)
+    types = ['single_choice'] * 4 + ['multiple_choice'] * 3 + ['fill_blank'] * 2 + ['essay']
+    questions = []
+    for i in range(count):
+        question_type = types[i * len(types) // count]
+        options, mask = [], None
+        if question_type in choices.CHOICE_TYPES:
+            options = [f'选项内容 {i}-{j}，' + '说明文字' * rng.randint(1, 8) for j in range(rng.randint(3, 6))]
+            correct = rng.sample(range(len(options)), 1 if question_type == 'single_choice' else 2)
+            mask = sum(1 << j for j in correct)
+        questions.append({
+            'id': i + 1,
+            'type': question_type,
+            'content': f'第 {i + 1} 题：' + '题干内容' * rng.randint(5, 40),
+            'options': options,
+            'answer_mask': mask,
+            'correct_answer': choices.mask_to_answer(mask) if mask is not None else '参考答案' * 10,
+            'explanation': '解析' * rng.randint(0, 30)
+        })
+    return {'id': 1, 'title': '基准测试试卷', 'description': '', 'questions': questions}
+
+
+def make_jobs(spec, candidates):
+    return [{
+        'name': f'{candidate:04d}/paper_{"answers" if answers else "questions"}.{fmt}',
+        'spec': spec, 'format': fmt, 'answers': answers, 'candidate': candidate, 'seed': 'bench'
+    } for candidate in range(1, candidates + 1) for answers in (False, True) for fmt in printing.FORMATS]
+
+
+def run(renderer, jobs):
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in printing.zip_stream(renderer.render(jobs)))
+    return time.perf_counter() - start, size
+
+
+def main():
+    candidates = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    questions = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    spec = make_spec(questions)
+    jobs = make_jobs(spec, candidates)
+
+    for fmt in printing.FORMATS:
+        renderer = printing.PaperRenderer(workers=1)
+        subset = [job for job in jobs if job['format'] == fmt]
+        elapsed, size = run(renderer, subset)
+        print(f'{fmt:<5} inline      {len(subset) / elapsed:8.1f} papers/s  '
+              f'({len(subset)} files, {size / 1024:.0f} KiB zipped)')
+
+    cpus = os.cpu_count() or 1
+    for workers in [1] + list(range(2, cpus + 1, 2)) + ([cpus] if cpus > 1 and cpus % 2 else []):
+        renderer = printing.PaperRenderer(workers=workers)
+        if workers > 1:
+            run(renderer, jobs[:workers * 2])  # start the pool outside the timing
+        elapsed, size = run(renderer, jobs)
+        renderer.shutdown()
+        label = 'inline' if workers == 1 else f'{workers} workers'
+        print(f'all   {label:<11} {len(jobs) / elapsed:8.1f} papers/s  '
+              f'({candidates} candidates x {len(jobs) // candidates} files, {elapsed:.2f} s)')
+
+
+if __name__ == '__main__':
+    main()
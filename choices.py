@@ -0,0 +1,110 @@
+"""Packed representation of choice options and answer keys.
+
+Options are stored as a plain list of option texts; the label of an option
+is its position (A, B, C, ...), so it never has to be stored or re-parsed.
+The answer key of a choice question is a bitmask with bit ``i`` set when
+option ``i`` is correct, which turns grading into an integer comparison.
+"""
+import re
+
+LABELS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+QUESTION_TYPES = ('single_choice', 'multiple_choice', 'essay', 'fill_blank')
+CHOICE_TYPES = ('single_choice', 'multiple_choice')
+
+_LABEL_RE = re.compile(r'^\s*([A-Za-z])\s*[.．、:：)）]\s*(.*)$', re.S)
+_STRICT_LABEL_RE = re.compile(r'^[A-Z]\s*[.．、)）]\s*')
+_ANSWER_SEPARATORS_RE = re.compile(r'[\s,，、;；|/]+')
+
+
+def split_options(options):
+    """Strip leading "A." style labels from ``options``.
+
+    Labels that run A, B, C... may use any case and separator. Outside such
+    a sequence only an unambiguous upper-case label ("C.", "C、", "C)") is
+    removed, so a mislabelled list like ["A.x", "C.y"] is stored as
+    ["x", "y"] and not shown as "B.C.y" once relabelled by position.
+    """
+    texts = [str(option).strip() for option in options or [] if str(option).strip()]
+    matches = [_LABEL_RE.match(text) for text in texts]
+    if len(texts) <= len(LABELS) and all(
+            match and match.group(1).upper() == LABELS[index] for index, match in enumerate(matches)):
+        return [match.group(2).strip() for match in matches]
+    return [_STRICT_LABEL_RE.sub('', text, count=1).strip() or text for text in texts]
+
+
+def label_options(options):
+    """Return ``options`` in the "A.text" form used by imports and exports."""
+    return [f'{LABELS[index]}.{text}' for index, text in enumerate(options or [])]
+
+
+def answer_to_mask(answer, option_count=len(LABELS)):
+    """Parse an answer such as "A,C", "AC" or "a、c" into a bitmask.
+
+    Returns None if the answer is not made of option labels in range.
+    """
+    tokens = [t for t in _ANSWER_SEPARATORS_RE.split(str(answer or '').strip().upper()) if t]
+    if not tokens:
+        return None
+    mask = 0
+    for token in tokens:
+        for letter in token:
+            index = LABELS.find(letter)
+            if index < 0 or index >= option_count:
+                return None
+            mask |= 1 << index
+    return mask
+
+
+def mask_to_answer(mask):
+    return ','.join(mask_labels(mask))
+
+
+def mask_labels(mask):
+    return [LABELS[i] for i in range(len(LABELS)) if mask >> i & 1]
+
+
+def labels_to_mask(labels):
+    """Bitmask for a collection of selected labels (e.g. form checkbox values)."""
+    mask = 0
+    for label in labels:
+        index = LABELS.find(str(label).strip().upper())
+        if index >= 0:
+            mask |= 1 << index
+    return mask
+
+
+def permute(options, answer_mask, order):
+    """Reorder options so that position ``i`` shows ``options[order[i]]``.
+
+    Returns ``(options, answer_mask)`` with the mask remapped to the new
+    positions, so shuffled variants can still be graded by comparison.
+    """
+    options = [options[index] for index in order]
+    if answer_mask is None:
+        return options, None
+    return options, sum(1 << i for i, index in enumerate(order) if answer_mask >> index & 1)
+
+
+def normalize(question_type, options, correct_answer):
+    """Return ``(options, correct_answer, answer_mask)`` in packed form.
+
+    For choice questions the options lose their labels and the answer is
+    rewritten canonically ("A,C") from the parsed mask. Other question types
+    are returned unchanged with no mask. Raises ValueError when a single
+    choice answer names more than one option, since no selection could
+    ever match it.
+    """
+    if question_type not in CHOICE_TYPES:
+        return options, correct_answer, None
+    options = split_options(options)
+    mask = answer_to_mask(correct_answer, len(options))
+    if mask is None:
+        return options, correct_answer, None
+    if question_type == 'single_choice' and mask & (mask - 1):
+        raise ValueError('Single choice questions must have exactly one correct answer')
+    return options, mask_to_answer(mask), mask
+
+
+def grade(answer_mask, selected_mask):
+    """A choice answer is correct when exactly the keyed options are selected."""
+    return answer_mask is not None and answer_mask == selected_mask
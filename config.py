@@ -10,4 +10,44 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     QUESTIONS_PER_PAGE = 10
-    PAPERS_PER_PAGE = 10
\ No newline at end of file
+    PAPERS_PER_PAGE = 10
+    # Generated Excel exports are cached on disk, keyed by content version
+    EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR') or \
+        os.path.join(basedir, 'instance', 'export_cache')
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES') or 256 * 1024 * 1024)
+    # Chunked question imports are staged here before being parsed
+    IMPORT_STAGING_DIR = os.environ.get('IMPORT_STAGING_DIR') or \
+        os.path.join(basedir, 'instance', 'import_staging')
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 1000)
+    IMPORT_CHUNK_SIZE = 4 * 1024 * 1024
+    # Staged uploads untouched this long are deleted; an import whose worker sent no
+    # heartbeat (one per IMPORT_BATCH_SIZE rows) for IMPORT_STALE_AFTER seconds is
+    # treated as interrupted and can be resumed
+    IMPORT_STAGING_TTL = int(os.environ.get('IMPORT_STAGING_TTL') or 24 * 3600)
+    IMPORT_STALE_AFTER = int(os.environ.get('IMPORT_STALE_AFTER') or 300)
+    # Login/password/import/reveal rate limits as (hits, seconds). RATELIMIT_STORAGE is
+    # 'memory' (per worker) or 'sqlite:///<path>' to share counters between workers
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or 'memory'
+    # Number of reverse proxies in front of the app whose X-Forwarded-For/-Proto
+    # headers are trusted (0 = clients connect directly); the limits key on the client IP
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR') or 0)
+    RATELIMIT_LOGIN_PER_IP = (20, 60)
+    RATELIMIT_LOGIN_PER_USERNAME = (5, 60)  # per username and client IP
+    RATELIMIT_LOGIN_PER_ACCOUNT = (50, 300)  # per username from all IPs together
+    RATELIMIT_PASSWORD_CHANGE = (5, 300)
+    RATELIMIT_IMPORT = (10, 60)
+    RATELIMIT_REVEAL = (120, 60)  # unauthenticated answer reveals per client IP
+    # Store a full question snapshot every N revisions; the rest are deltas
+    REVISION_CHECKPOINT_INTERVAL = 10
+    # Sync tokens are moved back by this many seconds to cover in-flight commits
+    SYNC_CLOCK_SKEW = 5
+    # Print rendering: pool size (0 = one per CPU) and max files per ZIP bundle
+    PRINT_WORKERS = int(os.environ.get('PRINT_WORKERS') or 0) or None
+    PRINT_MAX_FILES = 2000
+    # Connection pool of the async exam API (exam_api.py), per worker
+    EXAM_API_POOL_SIZE = int(os.environ.get('EXAM_API_POOL_SIZE') or 10)
+    # View/reveal counters are buffered per worker and written this often (seconds)
+    COUNTER_FLUSH_INTERVAL = int(os.environ.get('COUNTER_FLUSH_INTERVAL') or 5)
+    # Distinct (object, metric) keys a worker buffers between flushes; new keys beyond it are dropped
+    COUNTER_MAX_PENDING = int(os.environ.get('COUNTER_MAX_PENDING') or 100000)
@@ -0,0 +1,188 @@
+"""Batched view / answer-reveal counters.
+
+Hits are added to an in-memory buffer in each worker and written out every
+COUNTER_FLUSH_INTERVAL seconds by a background thread as one batched upsert
+(``count = count + n``), so a popular paper costs one row write per worker
+per interval instead of one locked UPDATE per page view. Buffers are also
+flushed at interpreter exit; a worker that is killed outright loses at most
+one interval of hits. The buffer holds at most COUNTER_MAX_PENDING distinct
+keys (hits on new keys are dropped beyond that), and hits that failed to be
+written MAX_RETRIES times in a row are dropped rather than kept forever.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from dbutil import upsert_add
+from models import db, Question, Paper, HitCounter
+
+QUESTION = 'question'
+PAPER = 'paper'
+VIEW = 'view'
+REVEAL = 'reveal'
+ENTITIES = {QUESTION: Question, PAPER: Paper}
+METRICS = (VIEW, REVEAL)
+# Ids per IN (...) lookup and rows per upsert statement, well below SQLite's variable limit
+CHUNK_SIZE = 500
+MAX_RETRIES = 3
+
+
+class CounterBuffer:
+    """Per-process buffer of ``(entity, entity_id, metric) -> hits``."""
+
+    def __init__(self, interval=5, max_pending=100000):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.app = None
+        self._failures = 0
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread_pid = None
+        self._stop = threading.Event()
+        self._max_ids = {}
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['COUNTER_FLUSH_INTERVAL']
+        self.max_pending = app.config['COUNTER_MAX_PENDING']
+        app.extensions['counters'] = self
+
+    def incr(self, entity, entity_id, metric, hits=1):
+        self._ensure_thread()
+        with self._lock:
+            self._add((entity, entity_id, metric), hits)
+
+    def incr_many(self, entity, entity_ids, metric):
+        self._ensure_thread()
+        with self._lock:
+            for entity_id in entity_ids:
+                self._add((entity, entity_id, metric), 1)
+
+    def in_range(self, entity, entity_id):
+        """Whether ``entity_id`` is between 1 and the largest existing id.
+
+        A cheap sanity check for ids from unauthenticated requests, run
+        before they reach the buffer. The largest id is cached and only
+        looked up again (one indexed MAX) when a higher id arrives and the
+        cached value is older than the flush interval.
+        """
+        if entity_id < 1:
+            return False
+        now = time.monotonic()
+        max_id, checked_at = self._max_ids.get(entity, (0, None))
+        if entity_id > max_id and (checked_at is None or now - checked_at >= self.interval):
+            model = ENTITIES[entity]
+            max_id = db.session.query(func.max(model.id)).scalar() or 0
+            self._max_ids[entity] = (max_id, now)
+        return entity_id <= max_id
+
+    def _add(self, key, hits):
+        # Ids come from unauthenticated requests; bound memory between flushes
+        if key in self._pending or len(self._pending) < self.max_pending:
+            self._pending[key] += hits
+
+    def _ensure_thread(self):
+        # Started lazily so every forked worker runs its own flusher
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            self._pending = Counter()  # hits buffered by a parent belong to the parent
+            threading.Thread(target=self._run, name='counter-flush', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """Write buffered hits to the database; returns the number of rows upserted."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        with self._flush_lock:
+            try:
+                with self.app.app_context():
+                    written = _write(pending)
+                self._failures = 0
+                return written
+            except Exception:
+                self._failures += 1
+                if self._failures <= MAX_RETRIES:
+                    # Keep the hits for the next attempt
+                    with self._lock:
+                        for key, hits in pending.items():
+                            self._add(key, hits)
+                    self.app.logger.exception('Flushing counters failed')
+                else:
+                    self._failures = 0
+                    self.app.logger.exception('Flushing counters failed %d times, dropping %d counters',
+                                              MAX_RETRIES + 1, len(pending))
+                return 0
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _existing_ids(connection, entity, ids):
+    model = ENTITIES[entity]
+    existing = set()
+    for chunk in _chunks(sorted(ids)):
+        existing.update(connection.scalars(select(model.id).where(model.id.in_(chunk))))
+    return existing
+
+
+def _write(pending):
+    table = HitCounter.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        # Hits come from unauthenticated requests; drop ids that do not exist
+        valid = {}
+        for entity in ENTITIES:
+            ids = {entity_id for (e, entity_id, _) in pending if e == entity}
+            if ids:
+                valid[entity] = _existing_ids(connection, entity, ids)
+        # Sorted so concurrent flushes from several workers lock rows in the same order
+        rows = [{'entity': entity, 'entity_id': entity_id, 'metric': metric, 'count': hits, 'updated_at': now}
+                for (entity, entity_id, metric), hits in sorted(pending.items())
+                if entity_id in valid.get(entity, ())]
+        if not rows:
+            return 0
+
+        for chunk in _chunks(rows):
+            upsert_add(connection, table, chunk, 'count', ['entity', 'entity_id', 'metric'], replace=['updated_at'])
+        return len(rows)
+
+
+def counts(entity, ids):
+    """``{id: {metric: count}}`` for the given objects (zeros included)."""
+    result = {entity_id: dict.fromkeys(METRICS, 0) for entity_id in ids}
+    if ids:
+        rows = db.session.query(HitCounter.entity_id, HitCounter.metric, HitCounter.count).filter(
+            HitCounter.entity == entity, HitCounter.entity_id.in_(ids))
+        for entity_id, metric, count in rows:
+            result[entity_id][metric] = count
+    return result
+
+
+def top(entity, metric, limit=20):
+    """The most viewed/revealed objects, served by the (entity, metric, count) index."""
+    model = ENTITIES[entity]
+    label = model.title if model is Paper else model.content
+    rows = db.session.query(HitCounter.entity_id, HitCounter.count, label).join(
+        model, model.id == HitCounter.entity_id
+    ).filter(
+        HitCounter.entity == entity, HitCounter.metric == metric
+    ).order_by(HitCounter.count.desc()).limit(limit)
+    return [{'id': entity_id, 'count': count, 'label': text[:100]} for entity_id, count, text in rows]
@@ -0,0 +1,36 @@
+"""Small SQL helpers shared by the counter tables (facets, analytics, counters)."""
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+_UPSERT_DIALECTS = {'sqlite': sqlite, 'postgresql': postgresql}
+
+
+def upsert_add(executor, table, rows, column, keys, replace=()):
+    """Insert ``rows``, or where a row with the same ``keys`` exists add the
+    new row's ``column`` to it (and overwrite the ``replace`` columns).
+
+    Uses the dialect's native upsert, so concurrent writers creating the same
+    row do not fail on the primary key. ``executor`` is a Connection or Session.
+    """
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    dialect = bind.dialect.name
+    if dialect == 'mysql':
+        statement = mysql.insert(table)
+        statement = statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column],
+             **{name: statement.inserted[name] for name in replace}})
+        executor.execute(statement, rows)
+    elif dialect in _UPSERT_DIALECTS:
+        statement = _UPSERT_DIALECTS[dialect].insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={column: table.c[column] + statement.excluded[column],
+                  **{name: statement.excluded[name] for name in replace}})
+        executor.execute(statement, rows)
+    else:
+        for row in rows:
+            result = executor.execute(
+                update(table).where(*(table.c[key] == row[key] for key in keys))
+                .values({column: table.c[column] + row[column], **{name: row[name] for name in replace}}))
+            if result.rowcount == 0:
+                executor.execute(insert(table).values(**row))
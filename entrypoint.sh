@@ -9,6 +9,9 @@ done
 # 自动迁移数据库
 flask db upgrade
 
+# 重算管理面板统计
+flask stats refresh
+
 # 自动创建admin用户
 python -c "from app import ensure_admin_user; ensure_admin_user()"
 
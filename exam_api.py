@@ -0,0 +1,186 @@
+"""Async JSON API for exam takers.
+
+A separate ASGI app (Quart) for the read-mostly, high-concurrency exam
+traffic: fetching a paper, fetching its questions and submitting answers.
+It shares models.py, config.py and the login session cookie with the Flask
+app, but queries the database through SQLAlchemy's asyncio engine, so a
+worker keeps serving other requests while a query is waiting on the
+database instead of blocking like a gunicorn sync worker.
+
+Run it next to the Flask app, e.g.::
+
+    hypercorn exam_api:app --bind 0.0.0.0:5001 --workers 2
+"""
+from functools import wraps
+
+from quart import Quart, jsonify, request, session
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import choices
+from config import Config
+from models import User, Question, Paper, paper_questions
+
+# Async driver used in place of each sync driver found in DATABASE_URI
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'mysql+mysqldb': 'mysql+aiomysql',
+}
+
+app = Quart(__name__)
+app.config.from_object(Config)
+
+engine = None
+Session = None
+
+
+def async_database_url(uri):
+    url = make_url(uri)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+@app.before_serving
+async def open_engine():
+    global engine, Session
+    url = async_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    options = {'pool_pre_ping': True}
+    if url.get_backend_name() != 'sqlite':  # aiosqlite opens a connection per checkout
+        options.update(pool_size=app.config['EXAM_API_POOL_SIZE'],
+                       max_overflow=app.config['EXAM_API_POOL_SIZE'])
+    engine = create_async_engine(url, **options)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+@app.after_serving
+async def close_engine():
+    await engine.dispose()
+
+
+def login_required(view):
+    """Accept users logged in through the Flask app (same signed session cookie)."""
+    @wraps(view)
+    async def wrapped(*args, **kwargs):
+        user_id = session.get('_user_id')  # written by Flask-Login
+        if user_id is None or not str(user_id).isdigit():
+            return jsonify({'error': 'Login required'}), 401
+        async with Session() as db_session:
+            if await db_session.scalar(select(User.id).where(User.id == int(user_id))) is None:
+                return jsonify({'error': 'Login required'}), 401
+        return await view(*args, **kwargs)
+    return wrapped
+
+
+def _paper_order(paper_id):
+    return (paper_questions.c.paper_id == paper_id,
+            (paper_questions.c.position, paper_questions.c.question_id))
+
+
+async def _paper_exists(db_session, paper_id):
+    return await db_session.scalar(select(Paper.id).where(Paper.id == paper_id)) is not None
+
+
+@app.route('/exam/api/papers/<int:paper_id>')
+@login_required
+async def get_paper(paper_id):
+    where, order = _paper_order(paper_id)
+    async with Session() as db_session:
+        paper = await db_session.get(Paper, paper_id)
+        if paper is None:
+            return jsonify({'error': 'Paper not found'}), 404
+        question_ids = (await db_session.scalars(
+            select(paper_questions.c.question_id).where(where).order_by(*order))).all()
+    return jsonify({
+        'id': paper.id,
+        'title': paper.title,
+        'description': paper.description,
+        'question_count': len(question_ids),
+        'question_ids': question_ids,
+        'updated_at': paper.updated_at.isoformat()
+    })
+
+
+@app.route('/exam/api/papers/<int:paper_id>/questions')
+@login_required
+async def get_paper_questions(paper_id):
+    """Questions in paper order, without answers or explanations."""
+    where, order = _paper_order(paper_id)
+    async with Session() as db_session:
+        if not await _paper_exists(db_session, paper_id):
+            return jsonify({'error': 'Paper not found'}), 404
+        rows = (await db_session.execute(
+            select(Question.id, Question.type, Question.content, Question.options)
+            .join(paper_questions, paper_questions.c.question_id == Question.id)
+            .where(where).order_by(*order)
+        )).all()
+    return jsonify([{
+        'number': number,
+        'id': row.id,
+        'type': row.type,
+        'content': row.content,
+        'options': [{'label': label, 'text': text} for label, text in zip(choices.LABELS, row.options or [])]
+        if row.type in choices.CHOICE_TYPES else []
+    } for number, row in enumerate(rows, 1)])
+
+
+def _normalize_text(value):
+    return ' '.join(str(value).split()).lower()
+
+
+def grade_answer(question, answer):
+    """True/False for auto-gradable questions, None for essays (graded by hand)."""
+    if question.type in choices.CHOICE_TYPES:
+        if answer is None:
+            return False
+        selected = choices.labels_to_mask(answer) if isinstance(answer, list) else choices.answer_to_mask(answer)
+        return choices.grade(question.answer_mask, selected)
+    if question.type == 'fill_blank':
+        return answer is not None and _normalize_text(answer) == _normalize_text(question.correct_answer)
+    return None
+
+
+@app.route('/exam/api/papers/<int:paper_id>/submit', methods=['POST'])
+@login_required
+async def submit_answers(paper_id):
+    """Grade ``{"answers": {"<question id>": "A,C" | ["A", "C"] | "text"}}``.
+
+    Choice questions are graded against the answer bitmask; answers to
+    questions outside the paper are ignored.
+    """
+    data = await request.get_json(silent=True) or {}
+    answers = data.get('answers')
+    if not isinstance(answers, dict):
+        return jsonify({'error': 'answers must be an object keyed by question id'}), 400
+
+    where, order = _paper_order(paper_id)
+    async with Session() as db_session:
+        if not await _paper_exists(db_session, paper_id):
+            return jsonify({'error': 'Paper not found'}), 404
+        questions = (await db_session.execute(
+            select(Question.id, Question.type, Question.answer_mask, Question.correct_answer)
+            .join(paper_questions, paper_questions.c.question_id == Question.id)
+            .where(where).order_by(*order)
+        )).all()
+
+    results = [{
+        'number': number,
+        'id': question.id,
+        'correct': grade_answer(question, answers.get(str(question.id)))
+    } for number, question in enumerate(questions, 1)]
+    gradable = [result for result in results if result['correct'] is not None]
+    correct = sum(1 for result in gradable if result['correct'])
+    return jsonify({
+        'paper_id': paper_id,
+        'total': len(results),
+        'gradable': len(gradable),
+        'correct': correct,
+        'score': round(correct * 100 / len(gradable), 1) if gradable else None,
+        'results': results
+    })
+
+
+if __name__ == '__main__':
+    app.run(port=5001)
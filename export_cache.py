@@ -0,0 +1,114 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+
+class ExportCache:
+    """Content-addressed on-disk cache for generated export files.
+
+    Artifacts are stored under a key derived from the content version they
+    were built from, so an unchanged paper or template is generated once and
+    then served straight from disk. The directory is bounded in size and the
+    least recently used files are evicted first.
+    """
+
+    def __init__(self, directory=None, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = app.config['EXPORT_CACHE_DIR']
+        self.max_bytes = app.config['EXPORT_CACHE_MAX_BYTES']
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['export_cache'] = self
+
+    @staticmethod
+    def make_key(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(repr(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path_for(self, key, suffix=''):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key, suffix=''):
+        """Return the cached file path for ``key`` or None on a miss."""
+        path = self.path_for(key, suffix)
+        try:
+            # Touch the file so eviction sees it as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, data, suffix=''):
+        """Atomically store ``data`` under ``key`` and return its path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(key, suffix)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+        return path
+
+    def get_or_create(self, key, build, suffix=''):
+        """Return the cached path for ``key``, calling ``build()`` on a miss."""
+        path = self.get(key, suffix)
+        if path is None:
+            path = self.put(key, build(), suffix)
+        return path
+
+    def open_or_create(self, key, build, suffix=''):
+        """Return an open binary file for ``key``, calling ``build()`` on a miss.
+
+        The file is opened here rather than by the caller, so an eviction
+        running in another request between the lookup and the read cannot
+        remove it from under the response.
+        """
+        path = self.get(key, suffix)
+        if path is not None:
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                pass
+        data = build()
+        path = self.put(key, data, suffix)
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            # Evicted again straight away (e.g. larger than the whole cache)
+            return io.BytesIO(data)
+
+    def evict(self):
+        """Remove least recently used files until the cache fits ``max_bytes``."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.startswith('.tmp-'):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
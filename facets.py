@@ -0,0 +1,131 @@
+"""Incrementally maintained facet counts for question filtering.
+
+Every write path that creates, deletes, retypes or retags questions calls
+into this module in the same transaction, so listing pages can show facet
+counts (and pagination totals) with a primary-key lookup instead of a
+GROUP BY over the whole bank.
+"""
+import re
+from collections import Counter
+
+from sqlalchemy import func, update
+
+import dbutil
+from models import db, Question, Tag, FacetCount, question_tags
+
+TYPE = 'type'
+TAG = 'tag'
+
+
+def adjust(facet, value, delta):
+    if not delta:
+        return
+    value = str(value)
+    if delta < 0:
+        # Nothing to take away from a value that has no row yet
+        db.session.execute(
+            update(FacetCount)
+            .where(FacetCount.facet == facet, FacetCount.value == value)
+            .values(count=FacetCount.count + delta)
+        )
+    else:
+        dbutil.upsert_add(db.session, FacetCount.__table__, [{'facet': facet, 'value': value, 'count': delta}],
+                          'count', ['facet', 'value'])
+
+
+def apply_counter(facet, counter, sign=1):
+    for value, delta in counter.items():
+        adjust(facet, value, sign * delta)
+
+
+def question_added(question_type, tag_ids=()):
+    adjust(TYPE, question_type, 1)
+    for tag_id in tag_ids:
+        adjust(TAG, tag_id, 1)
+
+
+def question_removed(question_type, tag_ids=()):
+    adjust(TYPE, question_type, -1)
+    for tag_id in tag_ids:
+        adjust(TAG, tag_id, -1)
+
+
+def question_changed(before_type, before_tag_ids, after_type, after_tag_ids):
+    if before_type != after_type:
+        adjust(TYPE, before_type, -1)
+        adjust(TYPE, after_type, 1)
+    before_tag_ids, after_tag_ids = set(before_tag_ids), set(after_tag_ids)
+    for tag_id in before_tag_ids - after_tag_ids:
+        adjust(TAG, tag_id, -1)
+    for tag_id in after_tag_ids - before_tag_ids:
+        adjust(TAG, tag_id, 1)
+
+
+def questions_removed(question_ids):
+    """Decrement counts for a bulk delete; only the deleted subset is grouped."""
+    types = db.session.query(Question.type, func.count()).filter(
+        Question.id.in_(question_ids)).group_by(Question.type)
+    apply_counter(TYPE, Counter(dict(types.all())), -1)
+    tags = db.session.query(question_tags.c.tag_id, func.count()).filter(
+        question_tags.c.question_id.in_(question_ids)).group_by(question_tags.c.tag_id)
+    apply_counter(TAG, Counter(dict(tags.all())), -1)
+
+
+def reset():
+    FacetCount.query.delete()
+
+
+def rebuild():
+    """Recompute every count from scratch, e.g. after a manual data fix."""
+    reset()
+    for question_type, count in db.session.query(Question.type, func.count()).group_by(Question.type):
+        adjust(TYPE, question_type, count)
+    for tag_id, count in db.session.query(question_tags.c.tag_id, func.count()).group_by(question_tags.c.tag_id):
+        adjust(TAG, tag_id, count)
+
+
+def get_count(facet, value):
+    row = db.session.get(FacetCount, (facet, str(value)))
+    return row.count if row else 0
+
+
+def total():
+    return db.session.query(func.coalesce(func.sum(FacetCount.count), 0)).filter(
+        FacetCount.facet == TYPE).scalar()
+
+
+def counts():
+    """All facet values with their counts, for rendering filters."""
+    rows = FacetCount.query.filter(FacetCount.count > 0).all()
+    types = {row.value: row.count for row in rows if row.facet == TYPE}
+    tag_counts = {int(row.value): row.count for row in rows if row.facet == TAG}
+    tags = Tag.query.filter(Tag.id.in_(list(tag_counts))).order_by(Tag.category, Tag.name).all() \
+        if tag_counts else []
+    return {
+        'type': types,
+        'tag': [dict(tag.to_dict(), count=tag_counts[tag.id]) for tag in tags]
+    }
+
+
+def split_tag_names(value):
+    """Accept a list of names or a comma separated string."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = re.split(r'[,，]', value)
+    return [str(name) for name in value]
+
+
+def resolve_tags(names, category=None):
+    """Return Tag rows for ``names``, creating the ones that do not exist."""
+    names = [name.strip() for name in names if name and name.strip()]
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+    existing = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names))}
+    for name in names:
+        if name not in existing:
+            existing[name] = Tag(name=name, category=category)
+            db.session.add(existing[name])
+    db.session.flush()
+    return [existing[name] for name in names]
@@ -0,0 +1,400 @@
+import csv
+import fcntl
+import json
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from openpyxl import load_workbook
+from sqlalchemy import delete, insert, update
+
+import analytics
+import choices
+import facets
+from models import db, ImportProgress, Question
+
+REQUIRED_COLUMNS = ['题目类型', '题目内容', '正确答案']
+TYPE_MAPPING = {
+    '单选题': 'single_choice',
+    '多选题': 'multiple_choice',
+    '问答题': 'essay',
+    '填空题': 'fill_blank'
+}
+ALLOWED_EXTENSIONS = ('.xlsx', '.csv')
+# Only the first errors are kept so a broken file cannot grow memory unbounded
+MAX_ERROR_MESSAGES = 100
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ImportFileError(ValueError):
+    """Raised when an import file cannot be read at all (as opposed to bad rows)."""
+
+
+class ChunkTooLargeError(ValueError):
+    """Raised when a chunk body exceeds the per-chunk limit."""
+
+
+class ImportOwnerError(RuntimeError):
+    """Raised when another worker has taken over an import this one was running."""
+
+
+def is_allowed_file(filename):
+    return filename.lower().endswith(ALLOWED_EXTENSIONS)
+
+
+def file_format(filename):
+    return 'csv' if filename.lower().endswith('.csv') else 'xlsx'
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _iter_xlsx(path):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        yield from rows
+    finally:
+        workbook.close()
+
+
+def _iter_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.reader(f)
+
+
+def iter_rows(path, fmt='xlsx'):
+    """Stream ``(row_number, record)`` pairs from an .xlsx or .csv file.
+
+    Rows are read one at a time (openpyxl read-only mode / csv reader), so
+    memory use does not depend on the size of the file. Row numbers match
+    what a user sees in a spreadsheet, i.e. the first data row is 2.
+    """
+    reader = _iter_csv(path) if fmt == 'csv' else _iter_xlsx(path)
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ImportFileError('File is empty')
+    columns = [str(c).strip() if c is not None else '' for c in header]
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise ImportFileError(f'Missing required columns: {", ".join(missing_columns)}')
+    for index, values in enumerate(reader, start=2):
+        if all(_is_blank(v) for v in values):
+            continue
+        yield index, dict(zip(columns, values))
+
+
+def parse_row(record):
+    """Validate a raw record and return the column values for a Question.
+
+    Raises ValueError with a user facing message if the row is invalid.
+    """
+    if any(_is_blank(record.get(col)) for col in REQUIRED_COLUMNS):
+        raise ValueError('Missing required fields')
+
+    question_type = TYPE_MAPPING.get(str(record['题目类型']).strip())
+    if not question_type:
+        raise ValueError(f'Invalid question type "{record["题目类型"]}"')
+
+    options = None
+    if not _is_blank(record.get('选项')):
+        options = [opt.strip() for opt in str(record['选项']).split('|') if opt.strip()]
+        if question_type in ['single_choice', 'multiple_choice'] and not options:
+            raise ValueError('Choice questions must have options')
+
+    options, correct_answer, answer_mask = choices.normalize(
+        question_type, options, str(record['正确答案']).strip())
+    explanation = record.get('解析')
+    return {
+        'type': question_type,
+        'content': str(record['题目内容']).strip(),
+        'options': options,
+        'correct_answer': correct_answer,
+        'answer_mask': answer_mask,
+        'explanation': None if _is_blank(explanation) else str(explanation).strip()
+    }
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows_processed = 0
+        self.success_count = 0
+        self.error_count = 0
+        self.error_messages = []
+
+    def add_error(self, message):
+        self.error_count += 1
+        if len(self.error_messages) < MAX_ERROR_MESSAGES:
+            self.error_messages.append(message)
+
+    def to_dict(self):
+        return {
+            'rows_processed': self.rows_processed,
+            'success_count': self.success_count,
+            'error_count': self.error_count,
+            'error_messages': self.error_messages
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        result = cls()
+        result.rows_processed = data.get('rows_processed', 0)
+        result.success_count = data.get('success_count', 0)
+        result.error_count = data.get('error_count', 0)
+        result.error_messages = list(data.get('error_messages', []))
+        return result
+
+
+def start_progress(upload_id, owner):
+    """Make ``owner`` the worker of ``upload_id`` and return its committed ImportResult."""
+    row = db.session.get(ImportProgress, upload_id, with_for_update=True)
+    if row is None:
+        row = ImportProgress(upload_id=upload_id, rows_processed=0, success_count=0,
+                             error_count=0, error_messages=[])
+        db.session.add(row)
+    row.owner = owner
+    result = ImportResult.from_dict({
+        'rows_processed': row.rows_processed,
+        'success_count': row.success_count,
+        'error_count': row.error_count,
+        'error_messages': row.error_messages or []
+    })
+    db.session.commit()
+    return result
+
+
+def _save_progress(upload_id, owner, result):
+    updated = db.session.execute(
+        update(ImportProgress)
+        .where(ImportProgress.upload_id == upload_id, ImportProgress.owner == owner)
+        .values(rows_processed=result.rows_processed, success_count=result.success_count,
+                error_count=result.error_count, error_messages=result.error_messages,
+                updated_at=datetime.utcnow())
+    )
+    if updated.rowcount != 1:
+        raise ImportOwnerError(upload_id)
+
+
+def clear_progress(upload_id=None, older_than=None):
+    """Delete the progress of a finished import, or of all imports not updated for ``older_than`` seconds."""
+    statement = delete(ImportProgress)
+    if upload_id is not None:
+        statement = statement.where(ImportProgress.upload_id == upload_id)
+    if older_than is not None:
+        statement = statement.where(ImportProgress.updated_at < datetime.utcnow() - timedelta(seconds=older_than))
+    db.session.execute(statement)
+    db.session.commit()
+
+
+def import_file(path, user_id, fmt='xlsx', batch_size=1000, progress=None, upload_id=None, owner=None):
+    """Validate and insert questions from ``path`` as the rows are read.
+
+    Valid rows are buffered up to ``batch_size`` and written with a single
+    executemany INSERT, then committed, so at most one batch is held in
+    memory. ``progress`` is called with the running ImportResult after each
+    commit, which happens at least every ``batch_size`` rows read, valid or
+    not.
+
+    With ``upload_id`` the position in the file is stored in ImportProgress
+    in the same transaction as each batch, and an import of an upload that
+    already has progress continues right after its last committed row.
+    ``owner`` claims the import; if another worker claims it meanwhile,
+    ImportOwnerError is raised before this one commits anything more.
+    """
+    result = start_progress(upload_id, owner) if upload_id is not None else ImportResult()
+    skip = result.rows_processed
+    batch = []
+    pending = 0
+
+    def flush():
+        nonlocal pending
+        if batch:
+            db.session.execute(insert(Question), batch)
+            facets.apply_counter(facets.TYPE, Counter(values['type'] for values in batch))
+            analytics.questions_created(len(batch))
+            result.success_count += len(batch)
+        if upload_id is not None:
+            _save_progress(upload_id, owner, result)
+        db.session.commit()
+        batch.clear()
+        pending = 0
+        if progress is not None:
+            progress(result)
+
+    try:
+        for index, record in iter_rows(path, fmt):
+            if skip:
+                skip -= 1
+                continue
+            result.rows_processed += 1
+            pending += 1
+            try:
+                values = parse_row(record)
+            except ValueError as e:
+                result.add_error(f'Row {index}: {str(e)}')
+            else:
+                values['created_by_id'] = user_id
+                batch.append(values)
+            if pending >= batch_size:
+                flush()
+        flush()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
+
+
+class UploadStaging:
+    """Local staging area for chunked, resumable uploads.
+
+    Each upload is a data file plus a JSON sidecar holding its metadata and
+    import progress. Chunks must be appended at the current offset, so a
+    client that lost its connection asks for the offset and resumes there.
+    Uploads untouched for ``ttl`` seconds are removed when a new one is
+    created. The worker running an import is recorded as ``owner`` and
+    stamps ``heartbeat_at`` as it goes; an import without a heartbeat for
+    ``stale_after`` seconds is reported as ``interrupted``.
+    """
+
+    def __init__(self, directory=None, ttl=24 * 3600, stale_after=300):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale_after = stale_after
+
+    def init_app(self, app):
+        self.directory = app.config['IMPORT_STAGING_DIR']
+        self.ttl = app.config['IMPORT_STAGING_TTL']
+        self.stale_after = app.config['IMPORT_STALE_AFTER']
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _paths(self, upload_id):
+        if not _UPLOAD_ID_RE.match(upload_id):
+            raise KeyError(upload_id)
+        base = os.path.join(self.directory, upload_id)
+        return base + '.part', base + '.json'
+
+    def create(self, filename, size=None):
+        self.sweep()
+        upload_id = uuid.uuid4().hex
+        data_path, _ = self._paths(upload_id)
+        open(data_path, 'wb').close()
+        self.save_meta(upload_id, {
+            'upload_id': upload_id,
+            'filename': filename,
+            'size': size,
+            'offset': 0,
+            'state': 'uploading',
+            'created_at': datetime.utcnow().isoformat()
+        })
+        return upload_id
+
+    def load_meta(self, upload_id):
+        _, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+        # The worker running the import died (killed, restarted) without recording an outcome
+        if meta['state'] == 'importing' and time.time() - meta.get('heartbeat_at', 0) > self.stale_after:
+            meta['state'] = 'interrupted'
+        return meta
+
+    def save_meta(self, upload_id, meta):
+        _, meta_path = self._paths(upload_id)
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def heartbeat(self, upload_id, meta):
+        """Save ``meta`` of a running import, marking its owner as alive."""
+        meta['heartbeat_at'] = time.time()
+        self.save_meta(upload_id, meta)
+
+    @contextmanager
+    def _locked(self, upload_id):
+        _, meta_path = self._paths(upload_id)
+        with open(meta_path + '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def claim(self, upload_id):
+        """Mark the upload as importing under a new owner token and return its meta.
+
+        Check and update happen under a file lock, so of two concurrent
+        calls only one gets the upload. Raises KeyError for an unknown
+        upload and ValueError with the state if it is neither fully
+        uploaded nor an interrupted import (e.g. its owner is still alive).
+        """
+        with self._locked(upload_id):
+            meta = self.load_meta(upload_id)
+            if meta['state'] not in ('uploading', 'interrupted'):
+                raise ValueError(meta['state'])
+            meta['state'] = 'importing'
+            meta['owner'] = uuid.uuid4().hex
+            self.heartbeat(upload_id, meta)
+        return meta
+
+    def data_path(self, upload_id):
+        return self._paths(upload_id)[0]
+
+    def append(self, upload_id, offset, stream, max_bytes=None, chunk_size=64 * 1024):
+        """Append ``stream`` at ``offset`` and return the new offset.
+
+        Raises ValueError if ``offset`` is not the current end of the upload,
+        and ChunkTooLargeError (discarding the partial chunk) if more than
+        ``max_bytes`` are sent.
+        """
+        meta = self.load_meta(upload_id)
+        data_path = self.data_path(upload_id)
+        current = os.path.getsize(data_path)
+        if offset != current:
+            raise ValueError(current)
+        with open(data_path, 'ab') as f:
+            written = 0
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    f.truncate(current)
+                    raise ChunkTooLargeError(max_bytes)
+                f.write(chunk)
+        meta['offset'] = os.path.getsize(data_path)
+        self.save_meta(upload_id, meta)
+        return meta['offset']
+
+    def discard(self, upload_id):
+        data_path, meta_path = self._paths(upload_id)
+        for path in (data_path, meta_path, meta_path + '.lock'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sweep(self):
+        """Remove uploads (finished or abandoned) not touched for ``ttl`` seconds."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            upload_id, _, _ = name.partition('.')
+            if not _UPLOAD_ID_RE.match(upload_id):
+                continue
+            try:
+                modified = max(os.path.getmtime(path) for path in self._paths(upload_id) if os.path.exists(path))
+            except ValueError:
+                continue  # removed by a concurrent sweep
+            if modified < cutoff:
+                self.discard(upload_id)
+
+    def stage_file(self, file):
+        """Save a regular multipart upload into the staging area."""
+        upload_id = self.create(file.filename)
+        file.save(self.data_path(upload_id))
+        return upload_id
@@ -0,0 +1,133 @@
+"""Pack choice options and answer bitmask
+
+Revision ID: c988020dbcab
+Revises: e86582a3c9b6
+Create Date: 2026-10-19 13:23:35.995354
+
+"""
+from itertools import groupby
+
+from alembic import op
+import sqlalchemy as sa
+
+import choices
+import revisions
+
+
+# revision identifiers, used by Alembic.
+revision = 'c988020dbcab'
+down_revision = 'e86582a3c9b6'
+branch_labels = None
+depends_on = None
+
+
+question = sa.table('question',
+    sa.column('id', sa.Integer),
+    sa.column('type', sa.String),
+    sa.column('options', sa.JSON),
+    sa.column('correct_answer', sa.Text),
+    sa.column('answer_mask', sa.Integer)
+)
+
+question_revision = sa.table('question_revision',
+    sa.column('id', sa.Integer),
+    sa.column('question_id', sa.Integer),
+    sa.column('version', sa.Integer),
+    sa.column('is_checkpoint', sa.Boolean),
+    sa.column('data', sa.JSON)
+)
+
+
+def _pack(question_type, options, correct_answer):
+    try:
+        return choices.normalize(question_type, options, correct_answer)
+    except ValueError:
+        # Existing single choice rows keyed with several options stay unpacked (ungradable) until edited
+        return choices.split_options(options), correct_answer, None
+
+
+def _convert_choice_questions(convert):
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(question.c.id, question.c.type, question.c.options, question.c.correct_answer)
+        .where(question.c.type.in_(choices.CHOICE_TYPES))
+    ).fetchall()
+    updates = [dict(convert(row), question_id=row.id) for row in rows]
+    if updates:
+        bind.execute(
+            question.update().where(question.c.id == sa.bindparam('question_id')),
+            updates
+        )
+
+
+def _convert_revisions(convert):
+    """Rewrite the change log so every revision is in the format ``convert`` produces.
+
+    Each question's history is replayed, every state converted, and the
+    deltas recomputed between converted states, since a text delta of the
+    old answer key would not apply to the rewritten one.
+    """
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(question_revision.c.id, question_revision.c.question_id,
+                  question_revision.c.is_checkpoint, question_revision.c.data)
+        .order_by(question_revision.c.question_id, question_revision.c.version)
+    )
+    updates = []
+    for _, history in groupby(rows, key=lambda row: row.question_id):
+        state, previous = {}, None
+        for row in history:
+            state = revisions.apply_delta({} if row.is_checkpoint else state, row.data)
+            converted = convert(state)
+            if row.is_checkpoint:
+                data = {field: {'v': value} for field, value in converted.items()}
+            else:
+                data = revisions.make_delta(previous or {}, converted)
+            previous = converted
+            if data != row.data:
+                updates.append({'revision_id': row.id, 'data': data})
+    for start in range(0, len(updates), 1000):
+        bind.execute(
+            question_revision.update().where(question_revision.c.id == sa.bindparam('revision_id')),
+            updates[start:start + 1000]
+        )
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('answer_mask', sa.Integer(), nullable=True))
+
+    # ### end Alembic commands ###
+
+    def pack(row):
+        options, correct_answer, answer_mask = _pack(row.type, row.options, row.correct_answer)
+        return {'options': options, 'correct_answer': correct_answer, 'answer_mask': answer_mask}
+
+    def pack_revision(state):
+        if state.get('type') not in choices.CHOICE_TYPES:
+            return state
+        options, correct_answer, _ = _pack(state['type'], state.get('options'), state.get('correct_answer'))
+        return dict(state, options=options, correct_answer=correct_answer)
+
+    _convert_choice_questions(pack)
+    _convert_revisions(pack_revision)
+
+
+def downgrade():
+    def unpack(row):
+        return {'options': choices.label_options(row.options), 'correct_answer': row.correct_answer, 'answer_mask': None}
+
+    def unpack_revision(state):
+        if state.get('type') not in choices.CHOICE_TYPES:
+            return state
+        return dict(state, options=choices.label_options(state.get('options')))
+
+    _convert_choice_questions(unpack)
+    _convert_revisions(unpack_revision)
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_column('answer_mask')
+
+    # ### end Alembic commands ###
@@ -3,13 +3,25 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Enum
+import choices
 
 db = SQLAlchemy()
 
-# Association table for many-to-many relationship between papers and questions
+# Association table for many-to-many relationship between papers and questions.
+# ``position`` orders questions within a paper; values are spaced apart so a
+# question can be moved between two others by writing a single row (see ordering.py)
 paper_questions = db.Table('paper_questions',
     db.Column('paper_id', db.Integer, db.ForeignKey('paper.id'), primary_key=True),
-    db.Column('question_id', db.Integer, db.ForeignKey('question.id'), primary_key=True)
+    db.Column('question_id', db.Integer, db.ForeignKey('question.id'), primary_key=True),
+    db.Column('position', db.Integer, nullable=False, server_default='0'),
+    db.Index('ix_paper_questions_paper_id_position', 'paper_id', 'position')
+)
+
+# Association table for many-to-many relationship between questions and tags
+question_tags = db.Table('question_tags',
+    db.Column('question_id', db.Integer, db.ForeignKey('question.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_question_tags_tag_id_question_id', 'tag_id', 'question_id')
 )
 
 class User(UserMixin, db.Model):
@@ -30,25 +42,156 @@ class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(Enum('single_choice', 'multiple_choice', 'essay', 'fill_blank', name='question_types'), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    options = db.Column(db.JSON)  # For choice questions
+    options = db.Column(db.JSON)  # For choice questions: option texts, labelled by position
     correct_answer = db.Column(db.Text, nullable=False)
+    answer_mask = db.Column(db.Integer)  # Bit i set when option i is correct (choice questions)
     explanation = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_by = db.relationship('User', backref=db.backref('questions', lazy=True))
-    papers = db.relationship('Paper', secondary=paper_questions, back_populates='questions')
+    # Writable so that deleting a question removes its membership rows
+    papers = db.relationship('Paper', secondary=paper_questions)
+    tags = db.relationship('Tag', secondary=question_tags, back_populates='questions')
+
+    __table_args__ = (
+        db.Index('ix_question_created_at', 'created_at'),
+        db.Index('ix_question_type', 'type'),
+    )
+
+    def set_answer(self, options, correct_answer):
+        """Store options and answer, packing them for choice questions.
+
+        Raises ValueError for a single choice answer naming several options.
+        """
+        self.options, self.correct_answer, self.answer_mask = \
+            choices.normalize(self.type, options, correct_answer)
+
+    @property
+    def is_choice(self):
+        return self.type in choices.CHOICE_TYPES
+
+    @property
+    def labeled_options(self):
+        """``(label, text)`` pairs for rendering choice options."""
+        if not self.is_choice:
+            return [(None, option) for option in self.options or []]
+        return list(zip(choices.LABELS, self.options or []))
+
+    @property
+    def export_options(self):
+        """Options in the external "A.text" form used by imports and exports."""
+        if not self.is_choice:
+            return self.options
+        return choices.label_options(self.options)
 
     def to_dict(self):
         return {
             'id': self.id,
             'type': self.type,
             'content': self.content,
-            'options': self.options,
+            'options': self.export_options,
+            'tags': [tag.name for tag in self.tags],
+            'version': self.version,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
 
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False)
+    category = db.Column(db.String(64), index=True)  # Optional grouping, e.g. a chapter or subject
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    questions = db.relationship('Question', secondary=question_tags, back_populates='tags')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.category
+        }
+
+class FacetCount(db.Model):
+    """Precomputed number of questions per facet value, e.g. ('type', 'essay')
+    or ('tag', '<tag id>'). Maintained incrementally by facets.py."""
+    facet = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.String(64), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class StatSummary(db.Model):
+    """Materialized dashboard aggregates, e.g. ('total', 'questions') or
+    ('questions_by_day', '2025-07-07'). Maintained by analytics.py."""
+    metric = db.Column(db.String(32), primary_key=True)
+    bucket = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class HitCounter(db.Model):
+    """View / answer-reveal count of a question or paper, e.g.
+    ('question', 12, 'reveal'). Written in batches by counters.py."""
+    entity = db.Column(db.String(20), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_hit_counter_entity_metric_count', 'entity', 'metric', 'count'),
+    )
+
+class ImportProgress(db.Model):
+    """Committed position of a staged import (see importer.import_file).
+
+    Updated in the same transaction as every batch, so after a crash the
+    import resumes exactly after the last committed row. ``owner`` is the
+    token of the worker running it; a worker that lost ownership to a
+    resumed import cannot commit any further rows.
+    """
+    upload_id = db.Column(db.String(32), primary_key=True)
+    owner = db.Column(db.String(32), nullable=False)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    success_count = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    error_messages = db.Column(db.JSON)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class QuestionRevision(db.Model):
+    """One entry in a question's change log.
+
+    Checkpoint rows hold a full snapshot of the tracked fields; the rows in
+    between only hold the fields that changed (see revisions.py). There is
+    deliberately no foreign key to question so history outlives deletes.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    is_checkpoint = db.Column(db.Boolean, nullable=False, default=False)
+    data = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_by = db.relationship('User')
+
+    __table_args__ = (
+        db.UniqueConstraint('question_id', 'version', name='uq_question_revision_version'),
+    )
+
+    def to_dict(self):
+        return {
+            'question_id': self.question_id,
+            'version': self.version,
+            'is_checkpoint': self.is_checkpoint,
+            'changed_fields': sorted(self.data.keys()),
+            'created_at': self.created_at.isoformat(),
+            'created_by': self.created_by.username if self.created_by else None
+        }
+
+class Tombstone(db.Model):
+    """Marks a deleted question or paper so sync clients can drop their copy."""
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
 class Paper(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -57,7 +200,9 @@ class Paper(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_by = db.relationship('User', backref=db.backref('papers', lazy=True))
-    questions = db.relationship('Question', secondary=paper_questions, back_populates='papers')
+    # Read-only: membership and order are written through ordering.py
+    questions = db.relationship('Question', secondary=paper_questions, viewonly=True,
+                                order_by=(paper_questions.c.position, paper_questions.c.question_id))
 
     def to_dict(self):
         return {
@@ -0,0 +1,190 @@
+"""Ordered paper membership.
+
+Each ``paper_questions`` row carries a ``position``. Positions are spaced
+GAP apart, so a question can be moved or inserted between two neighbours by
+writing a single row at the midpoint of their positions. Only when two
+neighbours end up adjacent (after ~log2(GAP) moves into the same spot) is
+the paper renumbered. Reads go through the (paper_id, position) index.
+"""
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from models import db, Question, paper_questions
+
+GAP = 1024
+
+_pq = paper_questions.c
+
+
+def positions(paper_id):
+    """``(question_id, position)`` pairs of a paper, in order."""
+    return db.session.execute(
+        select(_pq.question_id, _pq.position)
+        .where(_pq.paper_id == paper_id)
+        .order_by(_pq.position, _pq.question_id)
+    ).all()
+
+
+def question_ids(paper_id):
+    return [question_id for question_id, _ in positions(paper_id)]
+
+
+def _position(paper_id, question_id):
+    return db.session.execute(
+        select(_pq.position).where(_pq.paper_id == paper_id, _pq.question_id == question_id)
+    ).scalar()
+
+
+def _spread(low, high, count):
+    """``count`` increasing positions strictly between ``low`` and ``high``
+    (either may be None for an open end), or None if there is no room."""
+    if low is None and high is None:
+        return [GAP * (i + 1) for i in range(count)]
+    if high is None:
+        return [low + GAP * (i + 1) for i in range(count)]
+    if low is None:
+        return [high - GAP * (count - i) for i in range(count)]
+    step = (high - low) // (count + 1)
+    if step < 1:
+        return None
+    return [low + step * (i + 1) for i in range(count)]
+
+
+def _renumber(paper_id, ordered_ids):
+    db.session.execute(delete(paper_questions).where(_pq.paper_id == paper_id))
+    if ordered_ids:
+        db.session.execute(insert(paper_questions), [
+            {'paper_id': paper_id, 'question_id': question_id, 'position': position}
+            for question_id, position in zip(ordered_ids, _spread(None, None, len(ordered_ids)))
+        ])
+
+
+def _stable_ids(ordered_ids, current):
+    """The largest set of already present questions whose relative order is
+    unchanged (longest increasing run of their current positions); these
+    rows can keep their positions."""
+    present = [question_id for question_id in ordered_ids if question_id in current]
+    tails, tail_ids, previous = [], [], {}
+    for question_id in present:
+        position = current[question_id]
+        low, high = 0, len(tails)
+        while low < high:
+            mid = (low + high) // 2
+            if tails[mid] < position:
+                low = mid + 1
+            else:
+                high = mid
+        previous[question_id] = tail_ids[low - 1] if low else None
+        if low == len(tails):
+            tails.append(position)
+            tail_ids.append(question_id)
+        else:
+            tails[low] = position
+            tail_ids[low] = question_id
+    stable = set()
+    question_id = tail_ids[-1] if tail_ids else None
+    while question_id is not None:
+        stable.add(question_id)
+        question_id = previous[question_id]
+    return stable
+
+
+def set_questions(paper_id, ordered_ids):
+    """Make the paper hold exactly ``ordered_ids`` in that order.
+
+    Unknown question ids are ignored. Rows that are already in the right
+    relative order keep their position, so saving a paper after removing,
+    adding or moving a few questions only writes those rows.
+    """
+    ordered_ids = list(dict.fromkeys(int(question_id) for question_id in ordered_ids))
+    if ordered_ids:
+        known = set(db.session.scalars(select(Question.id).where(Question.id.in_(ordered_ids))))
+        ordered_ids = [question_id for question_id in ordered_ids if question_id in known]
+    current = dict(positions(paper_id))
+
+    removed = set(current) - set(ordered_ids)
+    if removed:
+        db.session.execute(delete(paper_questions).where(
+            _pq.paper_id == paper_id, _pq.question_id.in_(removed)))
+
+    stable = _stable_ids(ordered_ids, current)
+    changes = {}
+    low, i = None, 0
+    while i < len(ordered_ids):
+        if ordered_ids[i] in stable:
+            low = current[ordered_ids[i]]
+            i += 1
+            continue
+        j = i
+        while j < len(ordered_ids) and ordered_ids[j] not in stable:
+            j += 1
+        high = current[ordered_ids[j]] if j < len(ordered_ids) else None
+        spread = _spread(low, high, j - i)
+        if spread is None:
+            _renumber(paper_id, ordered_ids)
+            return
+        changes.update(zip(ordered_ids[i:j], spread))
+        low, i = spread[-1], j
+
+    moved = [{'qid': question_id, 'pos': position}
+             for question_id, position in changes.items() if question_id in current]
+    added = [{'paper_id': paper_id, 'question_id': question_id, 'position': position}
+             for question_id, position in changes.items() if question_id not in current]
+    if moved:
+        db.session.execute(
+            update(paper_questions)
+            .where(_pq.paper_id == paper_id, _pq.question_id == bindparam('qid'))
+            .values(position=bindparam('pos')),
+            moved
+        )
+    if added:
+        db.session.execute(insert(paper_questions), added)
+
+
+def move(paper_id, question_id, after_id=None):
+    """Put ``question_id`` right after ``after_id`` (first if None), adding it
+    to the paper if it is not a member yet. Returns the new position.
+
+    Raises ValueError if ``after_id`` is not in the paper.
+    """
+    if after_id == question_id:
+        raise ValueError('A question cannot be placed after itself')
+    current = _position(paper_id, question_id)
+    if after_id is None:
+        low = None
+    else:
+        low = _position(paper_id, after_id)
+        if low is None:
+            raise ValueError(f'Question {after_id} is not in this paper')
+    following = select(_pq.position).where(_pq.paper_id == paper_id, _pq.question_id != question_id)
+    if low is not None:
+        following = following.where(_pq.position > low)
+    high = db.session.execute(following.order_by(_pq.position).limit(1)).scalar()
+
+    spread = _spread(low, high, 1)
+    if spread is None:
+        # Neighbours are adjacent: renumber the whole paper once
+        ordered_ids = [qid for qid in question_ids(paper_id) if qid != question_id]
+        index = ordered_ids.index(after_id) + 1 if after_id is not None else 0
+        ordered_ids.insert(index, question_id)
+        _renumber(paper_id, ordered_ids)
+        return _position(paper_id, question_id)
+
+    position = spread[0]
+    if current is None:
+        db.session.execute(insert(paper_questions).values(
+            paper_id=paper_id, question_id=question_id, position=position))
+    else:
+        db.session.execute(update(paper_questions).where(
+            _pq.paper_id == paper_id, _pq.question_id == question_id).values(position=position))
+    return position
+
+
+def remove(paper_id, question_id):
+    """Drop a question from a paper; returns False if it was not a member."""
+    result = db.session.execute(delete(paper_questions).where(
+        _pq.paper_id == paper_id, _pq.question_id == question_id))
+    return result.rowcount > 0
+
+
+def clear(paper_id):
+    db.session.execute(delete(paper_questions).where(_pq.paper_id == paper_id))
@@ -0,0 +1,355 @@
+"""Printable papers: DOCX documents and HTML print layouts.
+
+A paper is first turned into a plain-data spec in the request process;
+rendering only needs that spec, so per-candidate variants (questions
+shuffled within their type section, choice options shuffled with the answer
+key remapped) are rendered in a process pool and streamed out as a ZIP while
+the remaining files are still being produced. Variants are seeded from
+``(paper id, seed, candidate)`` so regenerating a bundle reproduces it.
+"""
+import hashlib
+import io
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+import choices
+
+FORMATS = ('docx', 'html')
+TYPE_TITLES = {
+    'single_choice': '单选题',
+    'multiple_choice': '多选题',
+    'essay': '问答题',
+    'fill_blank': '填空题'
+}
+SECTION_NUMBERS = '一二三四五六七八九十'
+# Fixed timestamp for archive members so identical input gives identical bytes
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+_jinja = None
+
+
+def paper_spec(paper):
+    """Everything needed to render ``paper``, as picklable plain data."""
+    return {
+        'id': paper.id,
+        'title': paper.title,
+        'description': paper.description or '',
+        'questions': [{
+            'id': question.id,
+            'type': question.type,
+            'content': question.content,
+            'options': list(question.options or []),
+            'answer_mask': question.answer_mask,
+            'correct_answer': question.correct_answer,
+            'explanation': question.explanation or ''
+        } for question in paper.questions]
+    }
+
+
+def _rng(*parts):
+    digest = hashlib.sha256('\0'.join(str(part) for part in parts).encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+def make_variant(spec, candidate, seed='', shuffle_questions=True, shuffle_options=True):
+    """Return a copy of ``spec`` shuffled for ``candidate``.
+
+    Questions only move within their run of same-type questions so the
+    paper keeps its sections; choice options are permuted and the answer
+    mask and text are remapped to the new labels.
+    """
+    rng = _rng(spec['id'], seed, candidate)
+    questions = []
+    for _, run in itertools.groupby(spec['questions'], key=lambda q: q['type']):
+        run = list(run)
+        if shuffle_questions:
+            rng.shuffle(run)
+        for question in run:
+            if shuffle_options and question['type'] in choices.CHOICE_TYPES and question['answer_mask'] is not None:
+                order = list(range(len(question['options'])))
+                rng.shuffle(order)
+                options, mask = choices.permute(question['options'], question['answer_mask'], order)
+                question = dict(question, options=options, answer_mask=mask,
+                                correct_answer=choices.mask_to_answer(mask))
+            questions.append(question)
+    return dict(spec, questions=questions, candidate=candidate)
+
+
+def sections(questions):
+    """Group consecutive same-type questions into numbered sections."""
+    result, number = [], 0
+    for index, (question_type, run) in enumerate(itertools.groupby(questions, key=lambda q: q['type'])):
+        items = []
+        for question in run:
+            number += 1
+            options = list(zip(choices.LABELS, question['options'])) \
+                if question['type'] in choices.CHOICE_TYPES else []
+            items.append(dict(question, number=number, labeled_options=options))
+        prefix = SECTION_NUMBERS[index] if index < len(SECTION_NUMBERS) else str(index + 1)
+        result.append({'title': f'{prefix}、{TYPE_TITLES.get(question_type, question_type)}', 'questions': items})
+    return result
+
+
+def render_html(spec, answers=False):
+    global _jinja
+    if _jinja is None:
+        _jinja = Environment(loader=FileSystemLoader(_TEMPLATE_DIR), autoescape=select_autoescape())
+    html = _jinja.get_template('print/paper.html').render(
+        paper=spec, sections=sections(spec['questions']), answers=answers,
+        candidate=spec.get('candidate'))
+    return html.encode('utf-8')
+
+
+# --- DOCX -------------------------------------------------------------------
+# A .docx is a zip of WordprocessingML parts; the handful needed for a plain
+# text document is written directly rather than pulling in a document library.
+
+_W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_INVALID_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+# 五号 (10.5pt) SimSun body text, 1.25 line spacing
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:styles xmlns:w="{_W_NS}"><w:docDefaults>'
+    '<w:rPrDefault><w:rPr><w:rFonts w:ascii="Times New Roman" w:hAnsi="Times New Roman" '
+    'w:eastAsia="SimSun"/><w:sz w:val="21"/><w:szCs w:val="21"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="60" w:line="300" w:lineRule="auto"/></w:pPr></w:pPrDefault>'
+    '</w:docDefaults></w:styles>'
+)
+# A4 portrait with 2.54cm margins
+_SECTION = ('<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+            '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" '
+            'w:header="851" w:footer="992" w:gutter="0"/></w:sectPr>')
+
+
+def _run(text, bold=False, size=None):
+    props = ('<w:b/>' if bold else '') + (f'<w:sz w:val="{size}"/><w:szCs w:val="{size}"/>' if size else '')
+    props = f'<w:rPr>{props}</w:rPr>' if props else ''
+    lines = _INVALID_XML_RE.sub('', str(text).replace('\r', '')).split('\n')
+    body = '<w:br/>'.join(f'<w:t xml:space="preserve">{escape(line)}</w:t>' for line in lines)
+    return f'<w:r>{props}{body}</w:r>'
+
+
+def _paragraph(*runs, align=None, indent=None, before=None, keep_next=False):
+    props = ''
+    if keep_next:
+        props += '<w:keepNext/>'
+    if before:
+        props += f'<w:spacing w:before="{before}"/>'
+    if indent:
+        props += f'<w:ind w:left="{indent}"/>'
+    if align:
+        props += f'<w:jc w:val="{align}"/>'
+    props = f'<w:pPr>{props}</w:pPr>' if props else ''
+    return f'<w:p>{props}{"".join(runs)}</w:p>'
+
+
+def _docx_body(spec, answers):
+    parts = [_paragraph(_run(spec['title'], bold=True, size=32), align='center')]
+    if spec['description']:
+        parts.append(_paragraph(_run(spec['description']), align='center'))
+    header = '姓名：__________    学号：__________    得分：________'
+    if spec.get('candidate') is not None:
+        header = f'试卷编号：{spec["candidate"]}    ' + header
+    parts.append(_paragraph(_run(header), align='center', before=120))
+    if answers:
+        parts.append(_paragraph(_run('（参考答案）', bold=True), align='center'))
+
+    for section in sections(spec['questions']):
+        parts.append(_paragraph(_run(section['title'], bold=True, size=24), before=240, keep_next=True))
+        for question in section['questions']:
+            parts.append(_paragraph(_run(f'{question["number"]}. '), _run(question['content']),
+                                    before=120, keep_next=bool(question['labeled_options'])))
+            for label, option in question['labeled_options']:
+                parts.append(_paragraph(_run(f'{label}. {option}'), indent=420))
+            if answers:
+                parts.append(_paragraph(_run('答案：', bold=True), _run(question['correct_answer']), indent=420))
+                if question['explanation']:
+                    parts.append(_paragraph(_run('解析：', bold=True), _run(question['explanation']), indent=420))
+            elif question['type'] == 'essay':
+                parts.extend(_paragraph() for _ in range(6))
+    return ''.join(parts)
+
+
+def render_docx(spec, answers=False):
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:document xmlns:w="{_W_NS}"><w:body>{_docx_body(spec, answers)}{_SECTION}</w:body></w:document>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in (('[Content_Types].xml', _CONTENT_TYPES), ('_rels/.rels', _PACKAGE_RELS),
+                           ('word/_rels/document.xml.rels', _DOCUMENT_RELS), ('word/styles.xml', _STYLES),
+                           ('word/document.xml', document)):
+            archive.writestr(zipfile.ZipInfo(name, ZIP_DATE), data, zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+RENDERERS = {'docx': render_docx, 'html': render_html}
+MIMETYPES = {
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'html': 'text/html; charset=utf-8'
+}
+
+
+def render_job(job):
+    """Render one file; runs in a pool worker so it only touches plain data."""
+    spec = job['spec']
+    if job.get('candidate') is not None:
+        spec = make_variant(spec, job['candidate'], job.get('seed', ''),
+                            job.get('shuffle_questions', True), job.get('shuffle_options', True))
+    return job['name'], RENDERERS[job['format']](spec, job.get('answers', False))
+
+
+def variant_key(spec, candidate, seed='', shuffle_questions=True, shuffle_options=True):
+    """Question order and answers a candidate got, for the bundle manifest."""
+    variant = make_variant(spec, candidate, seed, shuffle_questions, shuffle_options)
+    return [{'number': number, 'question_id': question['id'], 'answer': question['correct_answer']}
+            for number, question in enumerate(variant['questions'], 1)]
+
+
+def folder_names(candidates):
+    """Unique, filesystem safe bundle folder per candidate.
+
+    Names that sanitize to the same folder (e.g. "a.b" and "a_b", or ones
+    differing only in case) get a "_2", "_3", ... suffix instead of
+    overwriting each other in the ZIP.
+    """
+    folders, used = {}, set()
+    for candidate in candidates:
+        base = re.sub(r'[^\w-]', '_', candidate) if candidate is not None else 'original'
+        folder, index = base, 1
+        while folder.casefold() in used:
+            index += 1
+            folder = f'{base}_{index}'
+        used.add(folder.casefold())
+        folders[candidate] = folder
+    return folders
+
+
+def manifest(spec, candidates, seed, shuffle_questions, shuffle_options):
+    return json.dumps({
+        'paper_id': spec['id'],
+        'title': spec['title'],
+        'seed': seed,
+        'shuffle_questions': shuffle_questions,
+        'shuffle_options': shuffle_options,
+        'folders': {str(candidate): folder for candidate, folder in folder_names(candidates).items()},
+        'candidates': {
+            str(candidate): variant_key(spec, candidate, seed, shuffle_questions, shuffle_options)
+            for candidate in candidates
+        }
+    }, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+class _ZipOutput:
+    """Write-only file object that hands back whatever has been written."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_stream(files):
+    """Yield a ZIP archive of ``(name, data)`` pairs as they arrive.
+
+    The output is not seekable, so zipfile writes sizes in data descriptors
+    and each member can be sent as soon as it is added.
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, 'w') as archive:
+        for name, data in files:
+            # Documents are already compressed; only deflate the text formats
+            compress = zipfile.ZIP_STORED if name.endswith('.docx') else zipfile.ZIP_DEFLATED
+            info = zipfile.ZipInfo(name, ZIP_DATE)
+            info.compress_type = compress
+            archive.writestr(info, data)
+            yield output.take()
+    yield output.take()
+
+
+class PaperRenderer:
+    """Renders batches of print jobs, in a process pool when it pays off."""
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config['PRINT_WORKERS']
+        app.extensions['paper_renderer'] = self
+
+    def _get_executor(self):
+        with self._lock:
+            # A pool inherited through fork (e.g. gunicorn workers) is unusable
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def render(self, jobs):
+        """Yield ``(name, data)`` for ``jobs`` in order."""
+        workers = self.workers or os.cpu_count() or 1
+        if len(jobs) < 2 or workers < 2:
+            for job in jobs:
+                yield render_job(job)
+            return
+        chunksize = max(1, len(jobs) // (workers * 4))
+        yield from self._get_executor().map(render_job, jobs, chunksize=chunksize)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
@@ -0,0 +1,156 @@
+import heapq
+import os
+import sqlite3
+import threading
+import time
+
+
+def _roll(state, window):
+    """Advance a ``(window, current, previous)`` counter state to ``window``."""
+    if state is None:
+        return window, 0, 0
+    last_window, current, previous = state
+    if last_window == window:
+        return state
+    if last_window == window - 1:
+        return window, 0, current
+    return window, 0, 0
+
+
+def _estimate(state, fraction):
+    """Sliding-window estimate: the previous window weighted by how much of it
+    still overlaps the trailing period, plus the current window."""
+    _, current, previous = state
+    return previous * (1 - fraction) + current
+
+
+class MemoryBackend:
+    """Per-process counters. Cheap, but each gunicorn worker counts separately."""
+
+    # Sweep expired keys once the table grows past this many entries
+    max_keys = 100000
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, rules, now):
+        with self._lock:
+            states = []
+            for key, limit, period in rules:
+                entry = self._counters.get(key)
+                state = _roll(entry[:3] if entry else None, int(now // period))
+                if _estimate(state, (now % period) / period) >= limit:
+                    return False
+                states.append((key, state, now + period * 2))
+            for key, (window, current, previous), expires in states:
+                self._counters[key] = (window, current + 1, previous, expires)
+            if len(self._counters) > self.max_keys:
+                # Entries idle for two periods can only roll back to zero
+                self._counters = {
+                    key: entry for key, entry in self._counters.items() if entry[3] >= now
+                }
+                if len(self._counters) > self.max_keys // 2:
+                    # Still full of live keys (e.g. many distinct clients): forget the
+                    # oldest half so the next sweep is another max_keys / 2 hits away
+                    self._counters = dict(heapq.nlargest(
+                        self.max_keys // 2, self._counters.items(), key=lambda item: item[1][3]))
+            return True
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class SQLiteBackend:
+    """Counters in a local SQLite file, shared by all workers on one host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit ('
+                'key TEXT PRIMARY KEY, window INTEGER NOT NULL, '
+                'current INTEGER NOT NULL, previous INTEGER NOT NULL, '
+                'expires REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            # Connections must not be shared across a gunicorn fork
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def acquire(self, rules, now):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            states = []
+            for key, limit, period in rules:
+                row = conn.execute(
+                    'SELECT window, current, previous FROM rate_limit WHERE key = ?', (key,)
+                ).fetchone()
+                state = _roll(tuple(row) if row else None, int(now // period))
+                if _estimate(state, (now % period) / period) >= limit:
+                    conn.execute('ROLLBACK')
+                    return False
+                states.append((key, state, now + period * 2))
+            for key, (window, current, previous), expires in states:
+                conn.execute(
+                    'INSERT OR REPLACE INTO rate_limit (key, window, current, previous, expires) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, window, current + 1, previous, expires)
+                )
+            self._hits += 1
+            if self._hits % 1000 == 0:
+                conn.execute('DELETE FROM rate_limit WHERE expires < ?', (now,))
+            conn.execute('COMMIT')
+            return True
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def reset(self, key):
+        self._connect().execute('DELETE FROM rate_limit WHERE key = ?', (key,))
+
+
+class RateLimiter:
+    """Sliding-window rate limiter.
+
+    Each rule is a ``(key, limit, period)`` tuple allowing ``limit`` hits per
+    ``period`` seconds. A hit is only counted when every rule passes, so the
+    checks can run before any database query or password hash and a rejected
+    request costs a dictionary (or local SQLite) lookup.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.enabled = True
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        storage = app.config.get('RATELIMIT_STORAGE', 'memory')
+        if storage.startswith('sqlite:///'):
+            self.backend = SQLiteBackend(storage[len('sqlite:///'):])
+        else:
+            self.backend = MemoryBackend()
+        app.extensions['rate_limiter'] = self
+
+    def check(self, *rules):
+        """Record a hit against ``rules`` and return False if any is exhausted."""
+        if not self.enabled:
+            return True
+        return self.backend.acquire(rules, time.time())
+
+    def reset(self, key):
+        self.backend.reset(key)
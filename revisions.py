@@ -0,0 +1,138 @@
+import json
+from difflib import SequenceMatcher
+
+from flask import current_app
+
+from models import db, Question, QuestionRevision
+
+TRACKED_FIELDS = ('type', 'content', 'options', 'correct_answer', 'explanation')
+TEXT_FIELDS = ('content', 'correct_answer', 'explanation')
+
+
+def snapshot(question):
+    """Return the tracked fields of ``question`` as a plain dict."""
+    return {field: getattr(question, field) for field in TRACKED_FIELDS}
+
+
+def _text_delta(old, new):
+    """Edit script turning ``old`` into ``new`` as ``[start, end, replacement]``
+    ops against ``old``, or None if storing ``new`` outright is smaller."""
+    if not old or not new:
+        return None
+    ops = [
+        [i1, i2, new[j1:j2]]
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, old, new, autojunk=False).get_opcodes()
+        if tag != 'equal'
+    ]
+    if len(json.dumps(ops, ensure_ascii=False)) >= len(json.dumps(new, ensure_ascii=False)):
+        return None
+    return ops
+
+
+def _apply_text_delta(old, ops):
+    # Ops are in ascending order against the original string, so apply them
+    # back to front to keep the earlier offsets valid
+    text = old
+    for start, end, replacement in reversed(ops):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+def make_delta(before, after):
+    delta = {}
+    for field in TRACKED_FIELDS:
+        if before.get(field) == after.get(field):
+            continue
+        ops = _text_delta(before.get(field), after.get(field)) if field in TEXT_FIELDS else None
+        delta[field] = {'d': ops} if ops is not None else {'v': after.get(field)}
+    return delta
+
+
+def apply_delta(state, delta):
+    state = dict(state)
+    for field, change in delta.items():
+        if 'd' in change:
+            state[field] = _apply_text_delta(state[field], change['d'])
+        else:
+            state[field] = change['v']
+    return state
+
+
+def record_revision(question, before, user=None):
+    """Log the change from ``before`` to the current state of ``question``.
+
+    Must be called after the question has been modified and before commit.
+    Bumps ``question.version`` and returns the new QuestionRevision, or None
+    if no tracked field changed. Every REVISION_CHECKPOINT_INTERVAL versions
+    a full snapshot is stored so reconstruction replays a bounded number of
+    deltas.
+    """
+    after = snapshot(question)
+    delta = make_delta(before, after)
+    if not delta:
+        return None
+
+    has_history = db.session.query(QuestionRevision.id).filter_by(
+        question_id=question.id).first() is not None
+    if not has_history:
+        # Questions created before versioning (or by bulk import) get their
+        # original state recorded as the base checkpoint on first edit
+        db.session.add(QuestionRevision(
+            question_id=question.id,
+            version=question.version,
+            is_checkpoint=True,
+            data={field: {'v': value} for field, value in before.items()},
+            created_at=question.updated_at or question.created_at,
+            created_by_id=question.created_by_id
+        ))
+
+    question.version += 1
+    is_checkpoint = question.version % current_app.config['REVISION_CHECKPOINT_INTERVAL'] == 0
+    revision = QuestionRevision(
+        question_id=question.id,
+        version=question.version,
+        is_checkpoint=is_checkpoint,
+        data={field: {'v': value} for field, value in after.items()} if is_checkpoint else delta,
+        created_by_id=user.id if user is not None else None
+    )
+    db.session.add(revision)
+    return revision
+
+
+def reconstruct(question_id, version):
+    """Rebuild the tracked fields of a question as of ``version``.
+
+    Returns None if the version is not in the change log.
+    """
+    checkpoint = QuestionRevision.query.filter(
+        QuestionRevision.question_id == question_id,
+        QuestionRevision.version <= version,
+        QuestionRevision.is_checkpoint.is_(True)
+    ).order_by(QuestionRevision.version.desc()).first()
+    if checkpoint is None:
+        return None
+    deltas = QuestionRevision.query.filter(
+        QuestionRevision.question_id == question_id,
+        QuestionRevision.version > checkpoint.version,
+        QuestionRevision.version <= version
+    ).order_by(QuestionRevision.version).all()
+    if len(deltas) != version - checkpoint.version:
+        return None
+
+    state = apply_delta({}, checkpoint.data)
+    for revision in deltas:
+        state = apply_delta(state, revision.data)
+    return state
+
+
+def changed_since(since):
+    """Return ids of questions created or revised after ``since``.
+
+    Served from the indexed ``question_revision.created_at`` and
+    ``question.updated_at`` columns (the latter is set on insert too), so it
+    never scans the full change log.
+    """
+    revised = db.session.query(QuestionRevision.question_id).filter(
+        QuestionRevision.created_at > since)
+    created = db.session.query(Question.id).filter(Question.updated_at > since)
+    return sorted({row[0] for row in revised.union(created)})
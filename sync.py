@@ -0,0 +1,137 @@
+import base64
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import selectinload
+
+from models import db, Question, Paper, Tombstone, paper_questions
+
+# Rows are streamed from the database in pages of this size
+YIELD_PER = 500
+# Compressed output is flushed to the client roughly this often
+FLUSH_BYTES = 64 * 1024
+
+
+def encode_token(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode('ascii')).decode('ascii')
+
+
+def decode_token(token):
+    """Return the timestamp encoded in ``token``; raises ValueError if invalid."""
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii'))
+    except (UnicodeError, ValueError, TypeError) as e:
+        raise ValueError('Invalid sync token') from e
+
+
+def record_deletes(entity, ids):
+    """Add tombstones for ``ids``; the caller commits together with the delete."""
+    now = datetime.utcnow()
+    rows = [{'entity': entity, 'entity_id': entity_id, 'deleted_at': now} for entity_id in ids]
+    if rows:
+        db.session.execute(insert(Tombstone), rows)
+
+
+def record_delete_all(entity, model):
+    """Tombstone every row of ``model`` with a single INSERT ... SELECT."""
+    db.session.execute(insert(Tombstone).from_select(
+        ['entity', 'entity_id', 'deleted_at'],
+        select(literal(entity), model.id, literal(datetime.utcnow()))
+    ))
+
+
+def touch_papers_of(question_ids):
+    """Bump papers containing ``question_ids`` so their membership is re-synced."""
+    Paper.query.filter(Paper.id.in_(
+        select(paper_questions.c.paper_id).where(paper_questions.c.question_id.in_(question_ids))
+    )).update({Paper.updated_at: datetime.utcnow()}, synchronize_session=False)
+
+
+def question_payload(question):
+    return {
+        'id': question.id,
+        'type': question.type,
+        'content': question.content,
+        'options': question.export_options,
+        'correct_answer': question.correct_answer,
+        'answer_mask': question.answer_mask,
+        'explanation': question.explanation,
+        'tags': [tag.name for tag in question.tags],
+        'version': question.version,
+        'created_at': question.created_at.isoformat(),
+        'updated_at': question.updated_at.isoformat()
+    }
+
+
+def paper_payload(paper, question_ids):
+    return {
+        'id': paper.id,
+        'title': paper.title,
+        'description': paper.description,
+        'question_ids': question_ids,
+        'created_at': paper.created_at.isoformat(),
+        'updated_at': paper.updated_at.isoformat()
+    }
+
+
+def iter_changes(since, skew):
+    """Yield sync records for everything changed at or after ``since``.
+
+    The first record carries the token for the next sync. Tombstones come
+    before upserts so that a row deleted and re-created within the window
+    ends up present on the client. ``since`` of None means a full sync.
+    Tokens lag the server clock by ``skew`` seconds, so a client may see a
+    row twice; records are idempotent upserts/deletes.
+    """
+    next_token = encode_token(datetime.utcnow() - timedelta(seconds=skew))
+    yield {'kind': 'meta', 'token': next_token, 'full': since is None}
+
+    if since is not None:
+        tombstones = db.session.query(Tombstone.entity, Tombstone.entity_id).filter(
+            Tombstone.deleted_at >= since
+        ).order_by(Tombstone.id).yield_per(YIELD_PER)
+        for entity, entity_id in tombstones:
+            yield {'kind': entity, 'op': 'delete', 'id': entity_id}
+
+    questions = Question.query.options(selectinload(Question.tags))
+    papers = Paper.query
+    if since is not None:
+        questions = questions.filter(Question.updated_at >= since)
+        papers = papers.filter(Paper.updated_at >= since)
+    for question in questions.order_by(Question.id).yield_per(YIELD_PER):
+        yield {'kind': 'question', 'op': 'upsert', 'data': question_payload(question)}
+
+    # Papers are few compared to questions; load them with their membership
+    # in one query rather than nesting queries inside a streaming cursor
+    papers = papers.order_by(Paper.id).all()
+    members = {paper.id: [] for paper in papers}
+    if papers:
+        rows = db.session.query(paper_questions.c.paper_id, paper_questions.c.question_id).filter(
+            paper_questions.c.paper_id.in_(list(members))
+        ).order_by(paper_questions.c.paper_id, paper_questions.c.position)
+        for paper_id, question_id in rows:
+            members[paper_id].append(question_id)
+    for paper in papers:
+        yield {'kind': 'paper', 'op': 'upsert', 'data': paper_payload(paper, members[paper.id])}
+
+
+def ndjson_stream(records, compress=False):
+    """Encode ``records`` as NDJSON, optionally as a gzip stream."""
+    if not compress:
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pending = 0
+    for record in records:
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        chunk = compressor.compress(line)
+        pending += len(line)
+        if chunk:
+            yield chunk
+        if pending >= FLUSH_BYTES:
+            yield compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+    yield compressor.flush()
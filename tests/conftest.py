@@ -0,0 +1,79 @@
+"""Shared fixtures: the Flask app on a throwaway SQLite database, fresh for every test."""
+import os
+import sys
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix='theory-tests-')
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(_workdir, 'test.db')
+os.environ['EXPORT_CACHE_DIR'] = os.path.join(_workdir, 'export_cache')
+os.environ['IMPORT_STAGING_DIR'] = os.path.join(_workdir, 'import_staging')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import app as app_module
+import ordering
+from models import db, User, Question, Paper
+from ratelimit import MemoryBackend
+
+
+@pytest.fixture
+def app(tmp_path):
+    flask_app = app_module.app
+    flask_app.config['TESTING'] = True
+    app_module.export_cache.directory = str(tmp_path / 'export_cache')
+    os.makedirs(app_module.export_cache.directory)
+    app_module.upload_staging.directory = str(tmp_path / 'import_staging')
+    os.makedirs(app_module.upload_staging.directory)
+    app_module.limiter.backend = MemoryBackend()
+    # Tests flush counters explicitly; keep the background flusher asleep
+    app_module.counter_buffer.interval = 3600
+    app_module.counter_buffer._pending.clear()
+    app_module.counter_buffer._max_ids.clear()
+    config = dict(flask_app.config)
+    with flask_app.app_context():
+        db.create_all()
+        app_module.ensure_admin_user()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+    # Tests may tweak limits and sizes; don't let that leak into the next one
+    flask_app.config.clear()
+    flask_app.config.update(config)
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as the default admin."""
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def admin(app):
+    return User.query.filter_by(username='admin').one()
+
+
+@pytest.fixture
+def make_question(admin):
+    def make(content='题目', type='single_choice', options=('甲', '乙', '丙', '丁'), correct_answer='A', **fields):
+        question = Question(type=type, content=content, created_by=admin, **fields)
+        question.set_answer(list(options) if options is not None else None, correct_answer)
+        db.session.add(question)
+        db.session.commit()
+        return question
+    return make
+
+
+@pytest.fixture
+def make_paper(admin):
+    def make(title='试卷', question_ids=()):
+        paper = Paper(title=title, created_by=admin)
+        db.session.add(paper)
+        db.session.flush()
+        ordering.set_questions(paper.id, question_ids)
+        db.session.commit()
+        return paper
+    return make
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import analytics
+from models import db, StatSummary
+
+
+def summaries():
+    db.session.expire_all()
+    return {(row.metric, row.bucket): row.value for row in StatSummary.query
+            if row.value and row.metric not in (analytics.META, analytics.ORPHANS)}
+
+
+def assert_no_drift():
+    maintained = summaries()
+    analytics.refresh()
+    db.session.commit()
+    assert maintained == summaries()
+
+
+def add_question(client, content):
+    form = {'type': 'essay', 'content': content, 'explanation': '', 'correct_answer': '略', 'tags': ''}
+    assert client.post('/admin/questions', data=form).status_code == 302
+
+
+def add_paper(client, title, question_ids=()):
+    form = {'title': title, 'description': '', 'questions[]': [str(i) for i in question_ids]}
+    assert client.post('/admin/papers', data=form).status_code == 302
+
+
+def test_dashboard_never_refreshes_in_the_request(client):
+    stats = client.get('/admin/api/stats').json
+    assert stats['refreshed'] is False
+    assert stats['refreshed_at'] is None
+    assert stats['orphan_questions'] == 0
+    assert StatSummary.query.filter_by(metric=analytics.META).count() == 0
+
+
+def test_refresh_command_marks_the_dashboard_refreshed(app, client):
+    result = app.test_cli_runner().invoke(args=['stats', 'refresh'])
+    assert result.exit_code == 0, result.output
+    stats = client.get('/admin/api/stats').json
+    assert stats['refreshed'] is True
+    assert stats['totals'] == {'questions': 0, 'papers': 0, 'users': 1}
+
+
+def test_summaries_do_not_drift(client, make_question, make_paper):
+    # Rows created on earlier days, then one full refresh as a deployment would have
+    last_week = datetime.utcnow() - timedelta(days=7)
+    old = [make_question(f'旧{i}', created_at=last_week) for i in range(3)]
+    old_paper = make_paper('旧试卷', [old[0].id])
+    old_paper.created_at = last_week
+    db.session.commit()
+    analytics.refresh()
+    db.session.commit()
+
+    for i in range(4):
+        add_question(client, f'新{i}')
+    add_paper(client, '新试卷', [q.id for q in old[1:]])
+    assert client.post('/api/user', json={'username': 'u', 'email': 'u@example.com', 'password': 'pw'}).status_code == 200
+    assert_no_drift()
+
+    assert client.delete(f'/admin/questions/{old[0].id}').status_code == 200
+    assert client.post('/admin/questions/bulk-delete', json={'question_ids': [old[1].id]}).status_code == 200
+    assert client.delete(f'/admin/papers/{old_paper.id}').status_code == 200
+    assert_no_drift()
+
+    assert client.post('/admin/questions/clear-all').status_code == 200
+    assert_no_drift()
+    growth = client.get('/admin/api/stats?days=14').json['growth']
+    assert growth[-1]['questions_total'] == 0
+    assert growth[-1]['papers_total'] == 1
+
+
+def test_growth_totals_include_days_before_the_window():
+    today = datetime.utcnow().date()
+    long_ago = (today - timedelta(days=100)).isoformat()
+    rows = analytics.growth({long_ago: 5, today.isoformat(): 2}, {}, days=7)
+    assert len(rows) == 7
+    assert [row['questions_total'] for row in rows] == [5] * 6 + [7]
@@ -0,0 +1,150 @@
+import io
+import json
+import zlib
+from unittest import mock
+
+import pytest
+from sqlalchemy import inspect, select
+
+import archive
+import ordering
+from models import db, Tag
+
+
+@pytest.fixture
+def bank(app, admin, make_question, make_paper):
+    tag = Tag(name='函数', category='知识点')
+    db.session.add(tag)
+    questions = [make_question(f'第 {i} 题') for i in range(5)]
+    questions.append(make_question('简答', type='essay', options=None, correct_answer='略', explanation=None))
+    questions[0].tags.append(tag)
+    db.session.commit()
+    make_paper(question_ids=[q.id for q in reversed(questions)])
+    return questions
+
+
+def snapshot():
+    """Every row of every table, JSON columns as their stored text."""
+    with db.engine.connect() as connection:
+        return {table.name: connection.execute(select(*archive._archived_columns(table))
+                                               .order_by(*table.primary_key.columns)).all()
+                for table in db.metadata.sorted_tables}
+
+
+def indexes():
+    inspector = inspect(db.engine)
+    return {table: sorted(index['name'] for index in inspector.get_indexes(table))
+            for table in inspector.get_table_names()}
+
+
+def dumped(chunk_size=2):
+    buffer = io.BytesIO()
+    archive.dump(buffer, chunk_size=chunk_size)
+    return buffer.getvalue()
+
+
+def split_frames(data):
+    frames, offset = [], len(archive.MAGIC)
+    while offset < len(data):
+        kind, length, _ = archive.FRAME.unpack_from(data, offset)
+        offset += archive.FRAME.size
+        frames.append((kind, data[offset:offset + length]))
+        offset += length
+    return frames
+
+
+def join_frames(frames):
+    return archive.MAGIC + b''.join(archive.FRAME.pack(kind, len(payload), zlib.crc32(payload)) + payload
+                                    for kind, payload in frames)
+
+
+def test_round_trip_into_an_empty_database(bank):
+    before, order = snapshot(), [q.id for q in reversed(bank)]
+    data = dumped()
+    header, counts = archive.verify(io.BytesIO(data))
+    assert counts['question'] == 6 and counts['paper_questions'] == 6 and header['format'] == archive.FORMAT_VERSION
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    assert archive.load(io.BytesIO(data)) == counts
+    assert snapshot() == before
+    assert ordering.question_ids(1) == order
+
+
+def test_load_refuses_a_non_empty_database_without_replace(bank):
+    with pytest.raises(archive.ArchiveError, match='not empty'):
+        archive.load(io.BytesIO(dumped()))
+
+
+def test_replace_overwrites_existing_rows(bank, make_question):
+    data = dumped()
+    before = snapshot()
+    make_question('之后新增')
+    archive.load(io.BytesIO(data), replace=True)
+    assert snapshot() == before
+
+
+def test_stdin_is_spooled(bank):
+    data = dumped()
+    stream = mock.Mock(wraps=io.BytesIO(data))
+    stream.seekable.return_value = False
+    archive.load(stream, replace=True)
+
+
+def corrupt_payload(data):
+    # Flip a byte inside the header frame's payload
+    broken = bytearray(data)
+    broken[len(archive.MAGIC) + archive.FRAME.size + 2] ^= 0xFF
+    return bytes(broken)
+
+
+def replaced_rows(data):
+    # Well-formed frames with valid CRCs, but the rows differ from what the table checksum covers
+    frames = split_frames(data)
+    index = next(i for i, (kind, _) in enumerate(frames) if kind == archive.ROWS)
+    rows = json.loads(zlib.decompress(frames[index][1]))
+    rows[0] = [None] * len(rows[0])
+    frames[index] = archive.ROWS, zlib.compress(json.dumps(rows).encode())
+    return join_frames(frames)
+
+
+@pytest.mark.parametrize('damage, message', [
+    (corrupt_payload, 'Checksum mismatch'),
+    (replaced_rows, 'does not match its checksum'),
+    (lambda data: data[:-5], 'truncated'),
+    (lambda data: join_frames(split_frames(data)[:-1]), 'no trailer'),
+    (lambda data: data + b'\0', 'after the archive trailer'),
+    (lambda data: b'PK\x03\x04' + data[4:], 'Not a question bank archive'),
+])
+def test_damaged_archive_fails_verification_and_leaves_database_untouched(bank, damage, message):
+    data = damage(dumped())
+    before, before_indexes = snapshot(), indexes()
+    with pytest.raises(archive.ArchiveError, match=message):
+        archive.verify(io.BytesIO(data))
+    with pytest.raises(archive.ArchiveError, match=message):
+        archive.load(io.BytesIO(data), replace=True)
+    assert snapshot() == before
+    assert indexes() == before_indexes
+
+
+def test_failed_load_rolls_back_and_rebuilds_indexes(bank):
+    data = dumped()
+    before, before_indexes = snapshot(), indexes()
+    with mock.patch('archive._reset_sequences', side_effect=RuntimeError('connection lost')):
+        with pytest.raises(RuntimeError):
+            archive.load(io.BytesIO(data), replace=True)
+    assert snapshot() == before
+    assert indexes() == before_indexes
+
+
+def test_verify_command(app, bank, tmp_path):
+    path = tmp_path / 'bank.qbank'
+    path.write_bytes(dumped())
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['bank', 'verify', str(path)])
+    assert result.exit_code == 0 and 'OK: ' in result.output
+
+    path.write_bytes(path.read_bytes()[:-5])
+    result = runner.invoke(args=['bank', 'verify', str(path)])
+    assert result.exit_code == 1 and 'truncated' in result.output
@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import choices
+import revisions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('options, expected', [
+    (['A.x', 'B.y', 'C.z'], ['x', 'y', 'z']),
+    (['a. x', 'b) y'], ['x', 'y']),
+    (['A：x', 'B：y'], ['x', 'y']),
+    (['A.x', 'C.y'], ['x', 'y']),
+    (['B、x', 'A)y'], ['x', 'y']),
+    (['甲', 'B.乙'], ['甲', '乙']),
+    (['e.g. x', 'y'], ['e.g. x', 'y']),
+    (['x', '', '  y '], ['x', 'y']),
+    (None, []),
+])
+def test_split_options(options, expected):
+    assert choices.split_options(options) == expected
+
+
+def test_mislabelled_options_are_not_labelled_twice(make_question):
+    question = make_question(type='multiple_choice', options=['A.x', 'C.y'], correct_answer='AB')
+    assert question.options == ['x', 'y']
+    assert question.export_options == ['A.x', 'B.y']
+    assert choices.split_options(question.export_options) == question.options
+
+
+@pytest.mark.parametrize('answer, mask', [
+    ('A', 0b1), ('A,C', 0b101), ('ac', 0b101), ('C、A', 0b101), ('A C', 0b101), ('', None), ('E', None), ('A1', None),
+])
+def test_answer_to_mask(answer, mask):
+    assert choices.answer_to_mask(answer, 4) == mask
+
+
+def test_normalize():
+    assert choices.normalize('multiple_choice', ['A.x', 'B.y', 'C.z'], 'ca') == (['x', 'y', 'z'], 'A,C', 0b101)
+    assert choices.normalize('essay', None, '自由作答') == (None, '自由作答', None)
+    # An answer that is not made of labels is kept as typed, ungradable
+    assert choices.normalize('single_choice', ['x', 'y'], '见解析') == (['x', 'y'], '见解析', None)
+    with pytest.raises(ValueError):
+        choices.normalize('single_choice', ['x', 'y'], 'A,B')
+
+
+def test_permute_keeps_the_answer_on_the_same_texts():
+    options, mask = choices.permute(['w', 'x', 'y', 'z'], 0b0110, [3, 1, 0, 2])
+    assert options == ['z', 'x', 'w', 'y']
+    assert [options[i] for i in range(4) if mask >> i & 1] == ['x', 'y']
+    assert choices.grade(mask, choices.labels_to_mask(['B', 'D']))
+    assert not choices.grade(mask, choices.labels_to_mask(['B']))
+    assert not choices.grade(None, 0)
+
+
+def flask_db(database, *args):
+    env = dict(os.environ, DATABASE_URI='sqlite:///' + database, FLASK_APP='app.py')
+    subprocess.run([sys.executable, '-m', 'flask', 'db', *args], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def test_packing_migration_rewrites_revision_history(tmp_path):
+    database = str(tmp_path / 'migrate.db')
+    flask_db(database, 'upgrade', 'e86582a3c9b6')
+    states = [
+        {'type': 'multiple_choice', 'content': 'q', 'options': ['A.x', 'B.y', 'C.z'], 'correct_answer': 'AB',
+         'explanation': None},
+    ]
+    states.append(dict(states[0], correct_answer='ABC'))
+    states.append(dict(states[1], options=['A.x', 'B.y', 'C.z', 'D.w'], correct_answer='ABD'))
+    with sqlite3.connect(database) as connection:
+        connection.execute(
+            "INSERT INTO question (id, type, content, options, correct_answer, version, created_at, updated_at) "
+            "VALUES (1, 'multiple_choice', 'q', ?, 'ABD', 3, '2025-01-01', '2025-01-01')",
+            (json.dumps(states[-1]['options']),))
+        data = [{field: {'v': value} for field, value in states[0].items()},
+                revisions.make_delta(states[0], states[1]), revisions.make_delta(states[1], states[2])]
+        for version, revision in enumerate(data, start=1):
+            connection.execute(
+                "INSERT INTO question_revision (question_id, version, is_checkpoint, data, created_at) "
+                "VALUES (1, ?, ?, ?, '2025-01-01')", (version, version == 1, json.dumps(revision)))
+
+    flask_db(database, 'upgrade', 'c988020dbcab')
+    with sqlite3.connect(database) as connection:
+        options, answer, mask = connection.execute(
+            'SELECT options, correct_answer, answer_mask FROM question').fetchone()
+        history = [json.loads(row[0]) for row in connection.execute(
+            'SELECT data FROM question_revision ORDER BY version')]
+    assert (json.loads(options), answer, mask) == (['x', 'y', 'z', 'w'], 'A,B,D', 0b1011)
+    replayed = []
+    state = {}
+    for revision in history:
+        state = revisions.apply_delta(state, revision)
+        replayed.append((state['options'], state['correct_answer']))
+    assert replayed == [(['x', 'y', 'z'], 'A,B'), (['x', 'y', 'z'], 'A,B,C'), (['x', 'y', 'z', 'w'], 'A,B,D')]
@@ -0,0 +1,100 @@
+from unittest import mock
+
+import pytest
+
+import app as app_module
+import counters
+from models import HitCounter
+
+buffer = app_module.counter_buffer
+
+
+def stored():
+    return {(c.entity, c.entity_id, c.metric): c.count for c in HitCounter.query}
+
+
+def test_flush_adds_to_existing_counts(app, make_question):
+    question = make_question()
+    buffer.incr(counters.QUESTION, question.id, counters.VIEW, 3)
+    assert buffer.flush() == 1
+    buffer.incr(counters.QUESTION, question.id, counters.VIEW, 2)
+    buffer.incr(counters.QUESTION, question.id, counters.REVEAL)
+    assert buffer.flush() == 2
+    assert stored() == {('question', question.id, 'view'): 5, ('question', question.id, 'reveal'): 1}
+    assert buffer.flush() == 0
+
+
+def test_unknown_ids_are_dropped_on_flush(app, make_question):
+    question = make_question()
+    buffer.incr_many(counters.QUESTION, [question.id, 999], counters.VIEW)
+    assert buffer.flush() == 1
+    assert stored() == {('question', question.id, 'view'): 1}
+
+
+def test_pending_keys_are_capped(app, make_question, monkeypatch):
+    question = make_question()
+    monkeypatch.setattr(buffer, 'max_pending', 2)
+    buffer.incr_many(counters.QUESTION, [question.id, 100, 101], counters.VIEW)
+    # Keys already buffered still count once the cap is reached
+    buffer.incr(counters.QUESTION, question.id, counters.VIEW)
+    assert dict(buffer._pending) == {('question', question.id, 'view'): 2, ('question', 100, 'view'): 1}
+
+
+def test_failed_flush_keeps_hits_until_retries_run_out(app, make_question):
+    question = make_question()
+    buffer.incr(counters.QUESTION, question.id, counters.VIEW)
+    with mock.patch('counters._write', side_effect=RuntimeError('database is down')):
+        for _ in range(counters.MAX_RETRIES):
+            assert buffer.flush() == 0
+            assert buffer._pending
+        assert buffer.flush() == 0
+    assert not buffer._pending
+    assert stored() == {}
+
+
+def test_in_range_caches_the_largest_id(app, make_question):
+    first = make_question()
+    assert buffer.in_range(counters.QUESTION, first.id)
+    assert not buffer.in_range(counters.QUESTION, 0)
+    assert not buffer.in_range(counters.QUESTION, first.id + 1)
+    # Within the interval a new question is not looked up again
+    second = make_question()
+    assert not buffer.in_range(counters.QUESTION, second.id)
+    buffer._max_ids.clear()
+    assert buffer.in_range(counters.QUESTION, second.id)
+
+
+def test_reveal(app, make_question):
+    question = make_question()
+    client = app.test_client()
+    assert client.post(f'/api/questions/{question.id}/reveal').status_code == 204
+    assert client.post(f'/api/questions/{question.id + 1000}/reveal').status_code == 404
+    buffer.flush()
+    assert stored() == {('question', question.id, 'reveal'): 1}
+
+
+def test_reveal_is_rate_limited_per_ip(app, make_question):
+    question = make_question()
+    app.config['RATELIMIT_REVEAL'] = (2, 60)
+    client = app.test_client()
+    statuses = [client.post(f'/api/questions/{question.id}/reveal', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code
+                for _ in range(3)]
+    assert statuses == [204, 204, 429]
+    assert client.post(f'/api/questions/{question.id}/reveal',
+                       environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 204
+
+
+def test_paper_views_count_paper_and_questions(app, client, make_question, make_paper):
+    questions = [make_question(), make_question()]
+    paper = make_paper(question_ids=[q.id for q in questions])
+    assert client.get(f'/paper/{paper.id}').status_code == 200
+    response = client.get('/admin/api/counters', query_string={'entity': 'question',
+                                                              'ids': ','.join(str(q.id) for q in questions)})
+    assert response.json['counts'] == {str(q.id): {'view': 1, 'reveal': 0} for q in questions}
+    top = client.get('/admin/api/counters', query_string={'entity': 'paper'}).json['top']
+    assert [(row['id'], row['count']) for row in top] == [(paper.id, 1)]
+
+
+@pytest.mark.parametrize('query', [{'entity': 'user'}, {'metric': 'likes'}, {'ids': '1,x'}])
+def test_counters_api_rejects_bad_arguments(client, query):
+    assert client.get('/admin/api/counters', query_string=query).status_code == 400
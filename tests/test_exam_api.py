@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+import exam_api
+from models import db
+
+
+@pytest.fixture
+def paper(make_question, make_paper):
+    questions = [
+        make_question('多选', type='multiple_choice', options=('甲', '乙', '丙'), correct_answer='A,C'),
+        make_question('单选', options=('甲', '乙'), correct_answer='B'),
+        make_question('填空', type='fill_blank', options=None, correct_answer='Hello  World'),
+        make_question('简答', type='essay', options=None, correct_answer='略'),
+    ]
+    order = [questions[2].id, questions[0].id, questions[1].id, questions[3].id]
+    return make_paper(question_ids=order), questions, order
+
+
+def call(client, requests):
+    """Run ``(method, path, json)`` requests against the exam API with the Flask session cookie."""
+    async def run():
+        test_client = exam_api.app.test_client()
+        cookie = client.get_cookie('session')
+        if cookie is not None:
+            test_client.set_cookie('localhost', 'session', cookie.value)
+        responses = []
+        async with exam_api.app.test_app():
+            for method, path, body in requests:
+                response = await test_client.open(path, method=method, json=body)
+                responses.append((response.status_code, await response.get_json()))
+        return responses
+    db.session.commit()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('answer, expected', [
+    (['C', 'A'], True),
+    ('a,c', True),
+    ('AC', True),
+    (['A'], False),
+    ('A,B,C', False),
+    (None, False),
+])
+def test_choice_answers_are_graded_against_the_mask(make_question, answer, expected):
+    question = make_question(type='multiple_choice', options=('甲', '乙', '丙'), correct_answer='A,C')
+    assert exam_api.grade_answer(question, answer) is expected
+
+
+def test_fill_blank_ignores_case_and_whitespace(make_question):
+    question = make_question(type='fill_blank', options=None, correct_answer='Hello  World')
+    assert exam_api.grade_answer(question, ' hello world ')
+    assert not exam_api.grade_answer(question, 'hello')
+    assert not exam_api.grade_answer(question, None)
+
+
+def test_essays_are_not_graded(make_question):
+    question = make_question(type='essay', options=None, correct_answer='略')
+    assert exam_api.grade_answer(question, '略') is None
+
+
+def test_async_engine_uses_async_driver():
+    assert exam_api.async_database_url('sqlite:///x.db').drivername == 'sqlite+aiosqlite'
+    assert exam_api.async_database_url('mysql+pymysql://u@h/db').drivername == 'mysql+aiomysql'
+
+
+def test_login_required(app, paper):
+    paper, _, _ = paper
+    [(status, _)] = call(app.test_client(), [('GET', f'/exam/api/papers/{paper.id}', None)])
+    assert status == 401
+
+
+def test_paper_and_questions_in_paper_order(client, paper):
+    paper, _, order = paper
+    (status, meta), (_, questions), (missing, _) = call(client, [
+        ('GET', f'/exam/api/papers/{paper.id}', None),
+        ('GET', f'/exam/api/papers/{paper.id}/questions', None),
+        ('GET', '/exam/api/papers/999', None),
+    ])
+    assert status == 200 and meta['question_ids'] == order
+    assert [q['id'] for q in questions] == order
+    assert [q['number'] for q in questions] == [1, 2, 3, 4]
+    # No answers leak to exam takers
+    assert all('correct_answer' not in q and 'explanation' not in q for q in questions)
+    assert [o['label'] for o in questions[1]['options']] == ['A', 'B', 'C']
+    assert missing == 404
+
+
+def test_submit(client, paper):
+    paper, (multiple, single, blank, essay), _ = paper
+    (status, result), (bad, _) = call(client, [
+        ('POST', f'/exam/api/papers/{paper.id}/submit', {'answers': {
+            str(multiple.id): ['C', 'A'], str(single.id): 'A', str(blank.id): 'hello world',
+            str(essay.id): '略', '999': 'A'}}),
+        ('POST', f'/exam/api/papers/{paper.id}/submit', {'answers': []}),
+    ])
+    assert status == 200
+    assert (result['total'], result['gradable'], result['correct'], result['score']) == (4, 3, 2, 66.7)
+    assert [r['id'] for r in result['results']] == [blank.id, multiple.id, single.id, essay.id]
+    assert [r['correct'] for r in result['results']] == [True, True, False, None]
+    assert bad == 400
@@ -0,0 +1,63 @@
+import os
+
+from export_cache import ExportCache
+
+
+def test_open_or_create_builds_once(tmp_path):
+    cache = ExportCache(str(tmp_path))
+    calls = []
+
+    def build():
+        calls.append(1)
+        return b'data'
+
+    for _ in range(2):
+        with cache.open_or_create('key', build, '.xlsx') as f:
+            assert f.read() == b'data'
+    assert len(calls) == 1
+
+
+def test_open_or_create_rebuilds_a_file_evicted_after_lookup(tmp_path, monkeypatch):
+    cache = ExportCache(str(tmp_path))
+    cache.put('key', b'old', '.xlsx')
+    real_get = cache.get
+
+    def get_then_evict(key, suffix=''):
+        path = real_get(key, suffix)
+        os.remove(path)  # a concurrent LRU trim between lookup and open
+        return path
+
+    monkeypatch.setattr(cache, 'get', get_then_evict)
+    with cache.open_or_create('key', lambda: b'new', '.xlsx') as f:
+        assert f.read() == b'new'
+
+
+def test_open_handle_survives_eviction(tmp_path):
+    cache = ExportCache(str(tmp_path), max_bytes=10)
+    f = cache.open_or_create('a', lambda: b'x' * 8)
+    cache.put('b', b'y' * 8)  # trims the cache, evicting 'a'
+    assert not os.path.exists(cache.path_for('a'))
+    assert f.read() == b'x' * 8
+    f.close()
+
+
+def test_entry_larger_than_the_cache_is_still_served(tmp_path):
+    cache = ExportCache(str(tmp_path), max_bytes=4)
+    with cache.open_or_create('big', lambda: b'z' * 16) as f:
+        assert f.read() == b'z' * 16
+
+
+def test_cached_export_is_revalidated_by_etag(client):
+    response = client.get('/admin/questions/template')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert client.get('/admin/questions/template', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_export_etag_follows_question_changes(client, make_question, make_paper):
+    question = make_question()
+    paper = make_paper(question_ids=[question.id])
+    first = client.get(f'/admin/questions/export?paper_id={paper.id}')
+    assert client.get(f'/admin/questions/export?paper_id={paper.id}').headers['ETag'] == first.headers['ETag']
+    assert client.put(f'/api/question/{question.id}', json={'content': '改过的题目'}).status_code == 200
+    assert client.get(f'/admin/questions/export?paper_id={paper.id}').headers['ETag'] != first.headers['ETag']
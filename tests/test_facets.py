@@ -0,0 +1,88 @@
+from sqlalchemy import select
+
+import dbutil
+import facets
+from importer import import_file
+from models import db, FacetCount, Tag
+
+
+def live_counts():
+    db.session.expire_all()
+    return {(row.facet, row.value): row.count for row in FacetCount.query if row.count}
+
+
+def assert_no_drift():
+    maintained = live_counts()
+    facets.rebuild()
+    db.session.commit()
+    assert maintained == live_counts()
+
+
+def add(client, content, type='single_choice', tags='', answer='A', options=('甲', '乙')):
+    form = {'type': type, 'content': content, 'explanation': '', 'correct_answer': answer, 'tags': tags}
+    if options:
+        form['options[]'] = list(options)
+    assert client.post('/admin/questions', data=form).status_code == 302
+
+
+def question_ids(client, **filters):
+    response = client.get('/admin/api/questions', query_string=dict(filters, per_page=100))
+    return response.json['total'], sorted(item['id'] for item in response.json['items'])
+
+
+def test_upsert_add_accumulates_and_replaces(app):
+    table = FacetCount.__table__
+    dbutil.upsert_add(db.session, table, [{'facet': 'f', 'value': 'v', 'count': 2}], 'count', ['facet', 'value'])
+    dbutil.upsert_add(db.session, table, [{'facet': 'f', 'value': 'v', 'count': 3},
+                                          {'facet': 'f', 'value': 'w', 'count': 1}], 'count', ['facet', 'value'])
+    assert dict(db.session.execute(select(FacetCount.value, FacetCount.count)).all()) == {'v': 5, 'w': 1}
+
+
+def test_counts_do_not_drift(client):
+    add(client, '一', tags='代数,几何')
+    add(client, '二', tags='代数')
+    add(client, '三', type='essay', tags='几何', options=None, answer='略')
+    add(client, '四', type='multiple_choice', answer='A,B')
+    assert_no_drift()
+    algebra, geometry = (Tag.query.filter_by(name=name).one().id for name in ('代数', '几何'))
+    assert facets.get_count(facets.TAG, algebra) == 2
+
+    ids = question_ids(client)[1]
+    # Type and tag changes on edit
+    assert client.put(f'/api/question/{ids[0]}', json={'type': 'multiple_choice', 'tags': '几何,统计'}).status_code == 200
+    assert_no_drift()
+    # Single and bulk deletes
+    assert client.delete(f'/admin/questions/{ids[1]}').status_code == 200
+    assert client.post('/admin/questions/bulk-delete', json={'question_ids': ids[2:3]}).status_code == 200
+    assert_no_drift()
+    # Deleting a tag takes it out of every question
+    assert client.delete(f'/admin/api/tags/{geometry}').status_code == 200
+    assert_no_drift()
+    assert facets.get_count(facets.TAG, geometry) == 0
+
+    assert client.post('/admin/questions/clear-all').status_code == 200
+    assert live_counts() == {}
+    assert_no_drift()
+
+
+def test_facet_filters_match_the_questions(client):
+    add(client, '一', tags='代数,几何')
+    add(client, '二', tags='代数')
+    add(client, '三', type='essay', tags='几何', options=None, answer='略')
+    algebra, geometry = (Tag.query.filter_by(name=name).one().id for name in ('代数', '几何'))
+    ids = question_ids(client)[1]
+
+    assert question_ids(client, tag=algebra) == (2, ids[:2])
+    assert question_ids(client, tag=[algebra, geometry]) == (1, ids[:1])
+    assert question_ids(client, type='essay') == (1, ids[2:])
+    assert question_ids(client, type='essay', tag=algebra) == (0, [])
+    assert question_ids(client, q='二', tag=algebra) == (1, ids[1:2])
+
+
+def test_imported_questions_are_counted(app, admin, tmp_path):
+    path = tmp_path / 'q.csv'
+    path.write_text('题目类型,题目内容,正确答案,选项\n单选题,一,A,甲|乙\n问答题,二,略,\n多选题,三,AB,甲|乙\n',
+                    encoding='utf-8')
+    import_file(str(path), admin.id, fmt='csv', batch_size=2)
+    assert live_counts() == {('type', 'single_choice'): 1, ('type', 'essay'): 1, ('type', 'multiple_choice'): 1}
+    assert_no_drift()
@@ -0,0 +1,141 @@
+import io
+import time
+
+import pytest
+
+import app as app_module
+from importer import ChunkTooLargeError, ImportOwnerError, import_file, start_progress
+from models import db, ImportProgress, Question
+
+HEADER = '题目类型,题目内容,正确答案,选项\n'
+
+
+def write_csv(path, count, invalid_every=None):
+    lines = [HEADER]
+    for i in range(count):
+        question_type = '坏类型' if invalid_every and i % invalid_every == 0 else '单选题'
+        lines.append(f'{question_type},题{i},A,甲|乙\n')
+    path.write_text(''.join(lines), encoding='utf-8')
+    return str(path)
+
+
+class Crash(Exception):
+    pass
+
+
+def crash_after(batches):
+    def progress(result):
+        progress.calls += 1
+        if progress.calls == batches:
+            raise Crash()
+    progress.calls = 0
+    return progress
+
+
+def test_import_inserts_valid_rows_and_reports_errors(app, admin, tmp_path):
+    path = write_csv(tmp_path / 'q.csv', 30, invalid_every=10)
+    result = import_file(path, admin.id, fmt='csv', batch_size=7)
+    assert (result.rows_processed, result.success_count, result.error_count) == (30, 27, 3)
+    assert Question.query.count() == 27
+    assert result.error_messages[0].startswith('Row 2:')
+
+
+def test_progress_is_reported_for_invalid_rows_too(app, admin, tmp_path):
+    path = write_csv(tmp_path / 'q.csv', 50, invalid_every=1)
+    reports = []
+    import_file(path, admin.id, fmt='csv', batch_size=10, progress=lambda r: reports.append(r.rows_processed))
+    assert reports[:5] == [10, 20, 30, 40, 50]
+
+
+def test_resume_continues_after_the_last_committed_row(app, admin, tmp_path):
+    path = write_csv(tmp_path / 'q.csv', 95, invalid_every=20)
+    with pytest.raises(Crash):
+        import_file(path, admin.id, fmt='csv', batch_size=10, progress=crash_after(3),
+                    upload_id='a' * 32, owner='first')
+    assert Question.query.count() == 30 - 2
+
+    result = import_file(path, admin.id, fmt='csv', batch_size=10, upload_id='a' * 32, owner='second')
+    assert (result.rows_processed, result.success_count, result.error_count) == (95, 90, 5)
+    assert Question.query.count() == 90
+    assert sorted(q.content for q in Question.query) == sorted(f'题{i}' for i in range(95) if i % 20)
+
+
+def test_superseded_worker_cannot_commit(app, admin, tmp_path):
+    path = write_csv(tmp_path / 'q.csv', 40)
+
+    def taken_over(result):
+        # The worker stalls past the heartbeat deadline and a resumed import claims the upload
+        if result.rows_processed == 10:
+            start_progress('b' * 32, 'resumer')
+
+    with pytest.raises(ImportOwnerError):
+        import_file(path, admin.id, fmt='csv', batch_size=10, progress=taken_over,
+                    upload_id='b' * 32, owner='stalled')
+    assert Question.query.count() == 10
+    assert db.session.get(ImportProgress, 'b' * 32).rows_processed == 10
+
+
+def upload(client, data, filename='q.csv'):
+    upload_id = client.post('/admin/api/imports', json={'filename': filename, 'size': len(data)}).json['upload_id']
+    assert client.put(f'/admin/api/imports/{upload_id}?offset=0', data=data).status_code == 200
+    return upload_id
+
+
+def wait_for(client, upload_id):
+    for _ in range(100):
+        meta = client.get(f'/admin/api/imports/{upload_id}').json
+        if meta['state'] in ('done', 'failed'):
+            return meta
+        time.sleep(0.05)
+    raise AssertionError(meta)
+
+
+def test_complete_imports_in_the_background(client, tmp_path):
+    data = open(write_csv(tmp_path / 'q.csv', 25), 'rb').read()
+    upload_id = upload(client, data)
+    response = client.post(f'/admin/api/imports/{upload_id}/complete')
+    assert response.status_code == 202
+    meta = wait_for(client, upload_id)
+    assert (meta['state'], meta['success_count']) == ('done', 25)
+    assert ImportProgress.query.count() == 0
+    assert client.post(f'/admin/api/imports/{upload_id}/complete').status_code == 409
+
+
+def test_complete_refuses_a_live_import_and_resumes_a_dead_one(app, client, admin, tmp_path):
+    app.config['IMPORT_BATCH_SIZE'] = 10
+    path = write_csv(tmp_path / 'q.csv', 45)
+    upload_id = upload(client, open(path, 'rb').read())
+    staging = app_module.upload_staging
+
+    # A worker claims the upload, commits two batches and dies without a trace
+    meta = staging.claim(upload_id)
+    with pytest.raises(Crash):
+        import_file(staging.data_path(upload_id), admin.id, fmt='csv', batch_size=10,
+                    progress=crash_after(2), upload_id=upload_id, owner=meta['owner'])
+    assert client.post(f'/admin/api/imports/{upload_id}/complete').json['error'] == 'Import already running'
+
+    meta['heartbeat_at'] = time.time() - staging.stale_after - 1
+    staging.save_meta(upload_id, meta)
+    assert client.get(f'/admin/api/imports/{upload_id}').json['state'] == 'interrupted'
+    assert client.post(f'/admin/api/imports/{upload_id}/complete').status_code == 202
+    meta = wait_for(client, upload_id)
+    assert (meta['state'], meta['rows_processed'], meta['success_count']) == ('done', 45, 45)
+    db.session.expire_all()
+    assert Question.query.count() == 45
+
+
+def test_claim_is_exclusive(app, client, tmp_path):
+    upload_id = upload(client, open(write_csv(tmp_path / 'q.csv', 1), 'rb').read())
+    app_module.upload_staging.claim(upload_id)
+    with pytest.raises(ValueError):
+        app_module.upload_staging.claim(upload_id)
+
+
+def test_append_rejects_oversized_chunks(app, client, tmp_path):
+    staging = app_module.upload_staging
+    upload_id = staging.create('q.csv')
+    with pytest.raises(ChunkTooLargeError):
+        staging.append(upload_id, 0, io.BytesIO(b'x' * 100), max_bytes=50, chunk_size=16)
+    assert staging.append(upload_id, 0, io.BytesIO(b'x' * 40), max_bytes=50) == 40
+    with pytest.raises(ValueError):
+        staging.append(upload_id, 0, io.BytesIO(b'x'))
@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+import ordering
+from models import db
+
+
+@pytest.fixture
+def questions(make_question):
+    return [make_question(f'题{i}', type='essay', options=None, correct_answer='略').id for i in range(14)]
+
+
+def positions(paper_id):
+    return dict(ordering.positions(paper_id))
+
+
+def longest_increasing(values):
+    best = [1] * len(values)
+    for i in range(len(values)):
+        for j in range(i):
+            if values[j] < values[i]:
+                best[i] = max(best[i], best[j] + 1)
+    return max(best, default=0)
+
+
+def test_stable_ids_is_a_longest_increasing_run():
+    rng = random.Random(1)
+    for _ in range(200):
+        ids = list(range(rng.randint(0, 30)))
+        current = {i: rng.randint(0, 50) * 10 + i for i in ids}  # unique positions
+        order = rng.sample(ids, len(ids))
+        stable = ordering._stable_ids(order, current)
+        kept = [current[i] for i in order if i in stable]
+        assert kept == sorted(kept)
+        assert len(stable) == longest_increasing([current[i] for i in order])
+
+
+def test_set_questions_only_rewrites_moved_rows(make_paper, questions):
+    paper = make_paper(question_ids=questions[:8])
+    before = positions(paper.id)
+    # Move one question to the front, drop one and append two
+    order = [questions[5]] + questions[:5] + questions[6:7] + questions[8:10]
+    ordering.set_questions(paper.id, order)
+    db.session.commit()
+    assert ordering.question_ids(paper.id) == order
+    after = positions(paper.id)
+    changed = {qid for qid in after if before.get(qid) != after[qid]}
+    assert changed == {questions[5], questions[8], questions[9]}
+
+
+def test_set_questions_ignores_duplicates_and_unknown_ids(make_paper, questions):
+    paper = make_paper()
+    ordering.set_questions(paper.id, [questions[2], questions[1], questions[2], 99999])
+    assert ordering.question_ids(paper.id) == [questions[2], questions[1]]
+
+
+def test_random_reorders_keep_the_requested_order(make_paper, questions):
+    rng = random.Random(2)
+    paper = make_paper(question_ids=questions)
+    for _ in range(50):
+        order = rng.sample(questions, rng.randint(0, len(questions)))
+        ordering.set_questions(paper.id, order)
+        assert ordering.question_ids(paper.id) == order
+
+
+def test_move_writes_one_row_until_the_gap_is_used_up(make_paper, questions):
+    first, second, *others = questions
+    paper = make_paper(question_ids=[first, second])
+    # Each question inserted right after ``first`` halves the gap in front of the previous one
+    for count, question_id in enumerate(others, start=1):
+        before = positions(paper.id)
+        ordering.move(paper.id, question_id, first)
+        after = positions(paper.id)
+        assert ordering.question_ids(paper.id) == [first] + others[:count][::-1] + [second]
+        changed = {qid for qid in after if before.get(qid) != after[qid]}
+        if changed != {question_id}:
+            break  # no room left: the paper was renumbered once
+    else:
+        pytest.fail('the paper was never renumbered')
+    assert count == 11  # log2(GAP) inserts fit between two neighbours
+    assert sorted(after.values()) == [ordering.GAP * (i + 1) for i in range(len(after))]
+
+
+def test_move_api(client, make_paper, questions):
+    paper = make_paper(question_ids=questions[:3])
+    url = f'/admin/papers/{paper.id}/questions'
+    assert client.post(url, json={'question_id': questions[2], 'after_id': None}).status_code == 200
+    assert client.post(url, json={'question_id': questions[5], 'after_id': questions[0]}).status_code == 200
+    assert ordering.question_ids(paper.id) == [questions[2], questions[0], questions[5], questions[1]]
+    assert client.post(url, json={'question_id': questions[1], 'after_id': questions[9]}).status_code == 400
+    assert client.post(url, json={'question_id': questions[1], 'after_id': questions[1]}).status_code == 400
+    assert client.delete(f'{url}/{questions[5]}').status_code == 200
+    assert client.delete(f'{url}/{questions[5]}').status_code == 404
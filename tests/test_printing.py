@@ -0,0 +1,64 @@
+import io
+import json
+import zipfile
+
+import choices
+import printing
+
+
+def spec():
+    return {
+        'id': 7, 'title': '期末', 'description': '',
+        'questions': [
+            {'id': i, 'type': 'multiple_choice', 'content': f'多选{i}', 'options': ['甲', '乙', '丙', '丁'],
+             'answer_mask': 0b0101, 'correct_answer': 'A,C', 'explanation': ''} for i in range(1, 5)
+        ] + [
+            {'id': i, 'type': 'essay', 'content': f'问答{i}', 'options': [], 'answer_mask': None,
+             'correct_answer': '略', 'explanation': ''} for i in range(5, 8)
+        ]
+    }
+
+
+def keyed_texts(question):
+    return {text for i, text in enumerate(question['options']) if question['answer_mask'] >> i & 1}
+
+
+def test_folder_names_are_unique():
+    assert printing.folder_names(['a.b', 'a_b', 'A_B', '张三', None]) == {
+        'a.b': 'a_b', 'a_b': 'a_b_2', 'A_B': 'A_B_3', '张三': '张三', None: 'original'}
+
+
+def test_variants_are_reproducible_and_keep_sections_and_answers():
+    original = spec()
+    variant = printing.make_variant(original, 'S001', seed='x')
+    assert variant == printing.make_variant(original, 'S001', seed='x')
+    assert variant != printing.make_variant(original, 'S002', seed='x')
+    assert [q['type'] for q in variant['questions']] == [q['type'] for q in original['questions']]
+    assert sorted(q['id'] for q in variant['questions']) == list(range(1, 8))
+    for question in variant['questions']:
+        if question['type'] == 'multiple_choice':
+            assert keyed_texts(question) == {'甲', '丙'}
+            assert question['correct_answer'] == choices.mask_to_answer(question['answer_mask'])
+
+
+def test_unshuffled_variant_is_the_original_order():
+    original = spec()
+    variant = printing.make_variant(original, 'S001', shuffle_questions=False, shuffle_options=False)
+    assert variant['questions'] == original['questions']
+
+
+def test_bundle_has_a_manifest_and_a_folder_per_candidate(client, make_question, make_paper):
+    questions = [make_question(f'题{i}', type='multiple_choice', correct_answer='A,B') for i in range(3)]
+    paper = make_paper(question_ids=[q.id for q in questions])
+    response = client.get(f'/admin/papers/{paper.id}/print/bundle',
+                          query_string={'candidates': 'a.b,a_b', 'formats': 'html', 'answers': '1', 'seed': 's'})
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert sorted(archive.namelist()) == [
+        'a_b/paper_%d_answers.html' % paper.id, 'a_b_2/paper_%d_answers.html' % paper.id, 'manifest.json']
+    manifest = json.loads(archive.read('manifest.json'))
+    assert manifest['folders'] == {'a.b': 'a_b', 'a_b': 'a_b_2'}
+    for candidate in ('a.b', 'a_b'):
+        key = manifest['candidates'][candidate]
+        assert sorted(item['question_id'] for item in key) == sorted(q.id for q in questions)
+        assert all(len(item['answer'].split(',')) == 2 for item in key)
@@ -0,0 +1,63 @@
+from unittest import mock
+
+import pytest
+
+from models import User
+from ratelimit import MemoryBackend, SQLiteBackend
+
+NOW = 1000000.0
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    return MemoryBackend() if request.param == 'memory' else SQLiteBackend(str(tmp_path / 'limits.db'))
+
+
+def test_limit_per_window(backend):
+    assert [backend.acquire([('k', 3, 60)], NOW + i) for i in range(4)] == [True, True, True, False]
+    # Two periods later the old hits no longer count
+    assert backend.acquire([('k', 3, 60)], NOW + 120)
+
+
+def test_hit_is_only_counted_when_every_rule_passes(backend):
+    assert backend.acquire([('tight', 1, 60), ('loose', 2, 60)], NOW)
+    assert not backend.acquire([('tight', 1, 60), ('loose', 2, 60)], NOW)
+    # The rejected attempt did not use up the loose rule
+    assert backend.acquire([('loose', 2, 60)], NOW)
+    assert not backend.acquire([('loose', 2, 60)], NOW)
+
+
+def test_memory_backend_stays_bounded():
+    backend = MemoryBackend()
+    backend.max_keys = 100
+    for i in range(1000):
+        backend.acquire([(f'ip{i}', 5, 60)], NOW)
+    assert len(backend._counters) <= 100
+
+
+def login(app, username, ip):
+    return app.test_client().post('/login', data={'username': username, 'password': 'wrong'},
+                                  environ_base={'REMOTE_ADDR': ip}).status_code
+
+
+def test_username_limit_is_per_client_ip(app):
+    limit = app.config['RATELIMIT_LOGIN_PER_USERNAME'][0]
+    assert [login(app, 'admin', '10.0.0.1') for _ in range(limit + 1)][-1] == 429
+    # Someone else guessing the admin password does not lock the admin out elsewhere
+    assert login(app, 'admin', '10.0.0.2') == 302
+    assert login(app, 'Admin ', '10.0.0.1') == 429
+
+
+def test_account_limit_spans_all_ips(app):
+    app.config['RATELIMIT_LOGIN_PER_ACCOUNT'] = (3, 300)
+    codes = [login(app, 'admin', f'10.0.1.{i}') for i in range(5)]
+    assert codes == [302, 302, 302, 429, 429]
+    assert login(app, 'someone-else', '10.0.1.9') == 302
+
+
+def test_rejected_login_does_not_hash_the_password(app):
+    app.config['RATELIMIT_LOGIN_PER_IP'] = (1, 60)
+    login(app, 'admin', '10.0.2.1')
+    with mock.patch.object(User, 'check_password') as check_password:
+        assert login(app, 'admin', '10.0.2.1') == 429
+    check_password.assert_not_called()
@@ -0,0 +1,68 @@
+import random
+
+import revisions
+from models import db, QuestionRevision
+
+
+def edit(question, user, **fields):
+    before = revisions.snapshot(question)
+    for field, value in fields.items():
+        setattr(question, field, value)
+    revision = revisions.record_revision(question, before, user)
+    db.session.commit()
+    return revision
+
+
+def test_text_delta_round_trip():
+    rng = random.Random(0)
+    alphabet = '题目内容选项答案 abc，。'
+    for _ in range(200):
+        old = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 60)))
+        new = list(old)
+        for _ in range(rng.randint(1, 5)):
+            position = rng.randint(0, len(new))
+            new[position:position + rng.randint(0, 3)] = rng.choice(alphabet) * rng.randint(0, 3)
+        new = ''.join(new) or 'x'
+        delta = revisions.make_delta({'content': old}, {'content': new})
+        assert revisions.apply_delta({'content': old}, delta)['content'] == new
+
+
+def test_small_edit_stores_a_delta_not_the_text(make_question, admin):
+    question = make_question(content='很长的题干' * 50)
+    edit(question, admin, content='很长的题干' * 49 + '改过的题干')
+    revision = QuestionRevision.query.filter_by(question_id=question.id, version=2).one()
+    assert not revision.is_checkpoint
+    assert list(revision.data) == ['content']
+    assert 'd' in revision.data['content']
+
+
+def test_every_version_is_reconstructed_across_checkpoints(app, make_question, admin):
+    app.config['REVISION_CHECKPOINT_INTERVAL'] = 3
+    question = make_question(content='第0版', type='essay', options=None, correct_answer='答案')
+    states = {1: revisions.snapshot(question)}
+    for version in range(2, 12):
+        edit(question, admin, content=f'第{version}版' + '内容' * version,
+             explanation=None if version % 4 else f'解析{version}')
+        states[version] = revisions.snapshot(question)
+    assert question.version == 11
+
+    checkpoints = [r.version for r in QuestionRevision.query.filter_by(question_id=question.id, is_checkpoint=True)]
+    assert checkpoints == [1, 3, 6, 9]
+    for version, state in states.items():
+        assert revisions.reconstruct(question.id, version) == state
+    assert revisions.reconstruct(question.id, 12) is None
+
+
+def test_unchanged_save_records_nothing(make_question, admin):
+    question = make_question()
+    assert edit(question, admin, content=question.content) is None
+    assert question.version == 1
+    assert QuestionRevision.query.count() == 0
+
+
+def test_revision_api(client, make_question):
+    question = make_question(content='原题')
+    assert client.put(f'/api/question/{question.id}', json={'content': '新题'}).status_code == 200
+    assert client.get(f'/admin/api/questions/{question.id}/revisions/1').json['content'] == '原题'
+    assert client.get(f'/admin/api/questions/{question.id}/revisions/2').json['content'] == '新题'
+    assert client.get(f'/admin/api/questions/{question.id}/revisions/3').status_code == 404
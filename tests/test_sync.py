@@ -0,0 +1,81 @@
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+import sync
+
+
+@pytest.fixture(autouse=True)
+def no_skew(app):
+    app.config['SYNC_CLOCK_SKEW'] = 0
+
+
+def fetch(client, token=None, **params):
+    if token:
+        params['token'] = token
+    response = client.get('/admin/api/sync', query_string=params)
+    assert response.status_code == 200
+    body = response.data
+    if response.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    records = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+    assert records[0]['kind'] == 'meta'
+    return records[0]['token'], records[1:]
+
+
+def changes(records):
+    return [(r['kind'], r['op'], r['id'] if r['op'] == 'delete' else r['data']['id']) for r in records]
+
+
+def test_token_round_trip():
+    moment = datetime(2025, 1, 2, 3, 4, 5, 678)
+    assert sync.decode_token(sync.encode_token(moment)) == moment
+    with pytest.raises(ValueError):
+        sync.decode_token('not a token')
+
+
+def test_invalid_token_is_rejected(client):
+    assert client.get('/admin/api/sync?token=garbage').status_code == 400
+
+
+def test_full_then_incremental_sync(client, make_question, make_paper):
+    first, second = make_question('一'), make_question('二')
+    paper = make_paper(question_ids=[second.id, first.id])
+    token, records = fetch(client)
+    assert changes(records) == [('question', 'upsert', first.id), ('question', 'upsert', second.id),
+                                ('paper', 'upsert', paper.id)]
+    assert records[-1]['data']['question_ids'] == [second.id, first.id]
+
+    token, records = fetch(client, token)
+    assert records == []
+
+    third = make_question('三')
+    token, records = fetch(client, token)
+    assert changes(records) == [('question', 'upsert', third.id)]
+
+
+def test_deletes_are_synced_as_tombstones(client, make_question, make_paper):
+    questions = [make_question(str(i)) for i in range(4)]
+    paper = make_paper(question_ids=[q.id for q in questions])
+    ids = [q.id for q in questions]
+    token, _ = fetch(client)
+
+    assert client.delete(f'/api/question/{ids[0]}').status_code == 200
+    assert client.post('/admin/questions/bulk-delete', json={'question_ids': ids[1:3]}).status_code == 200
+    token, records = fetch(client, token)
+    assert changes(records) == [('question', 'delete', ids[0]), ('question', 'delete', ids[1]),
+                                ('question', 'delete', ids[2]), ('paper', 'upsert', paper.id)]
+    assert records[-1]['data']['question_ids'] == [ids[3]]
+
+    assert client.post('/admin/questions/clear-all').status_code == 200
+    token, records = fetch(client, token)
+    assert changes(records) == [('question', 'delete', ids[3]), ('paper', 'upsert', paper.id)]
+    assert records[-1]['data']['question_ids'] == []
+
+
+def test_gzip_stream(client, make_question):
+    make_question()
+    _, records = fetch(client, compress='gzip')
+    assert changes(records)[0][:2] == ('question', 'upsert')